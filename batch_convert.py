@@ -0,0 +1,264 @@
+# Headless batch conversion: stream messages through the same
+# translate -> parse -> convert pipeline as the app, without importing Kivy.
+#
+#   python batch_convert.py dump.txt                     # blank-line separated messages
+#   python batch_convert.py --format jsonl dump.jsonl     # {"message": ..., "lang": ...} per line
+#   cat dump.txt | python batch_convert.py --output converted.txt --checkpoint dump.ckpt
+#
+# Converted messages are saved to the database in chunked transactions and
+# then written to --output (stdout by default). With --checkpoint, the number
+# of input records already handled and the size of --output are recorded
+# after every chunk; a rerun with the same input skips those records and cuts
+# --output back to the recorded size before appending. Records that aren't
+# JSON objects with a message are skipped and counted.
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from database import DatabaseManager
+from pattern_template import PatternTemplate
+from pipeline import convert_message_to_pattern, make_translator, parse_area_category
+
+
+def read_text_messages(stream):
+    # Messages separated by one or more blank lines
+    block = []
+    for line in stream:
+        if line.strip():
+            block.append(line.rstrip('\n'))
+        elif block:
+            yield {'message': '\n'.join(block)}
+            block = []
+    if block:
+        yield {'message': '\n'.join(block)}
+
+
+def read_jsonl_messages(stream):
+    # One JSON object per line with 'message' and optionally 'lang',
+    # 'district' and 'category'; a line that isn't valid JSON yields None
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def read_messages(paths, fmt):
+    for path in paths or ['-']:
+        if fmt == 'auto':
+            path_fmt = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'text'
+        else:
+            path_fmt = fmt
+        reader = read_jsonl_messages if path_fmt == 'jsonl' else read_text_messages
+        if path == '-':
+            yield from reader(sys.stdin)
+        else:
+            with open(path, encoding='utf-8') as f:
+                yield from reader(f)
+
+
+# Pattern compiled and translation cache opened once per worker process
+_template = None
+_translator = None
+
+
+def _init_worker(pattern_text, db_name):
+    global _template, _translator
+    _template = PatternTemplate(pattern_text)
+    _translator = make_translator(db_name)
+
+
+def convert_record(record, translated):
+    # Returns the (input, lang, translated, converted, district, category)
+    # tuple that DatabaseManager.save_conversions stores
+    district, category = parse_area_category(translated)
+    district = record.get('district') or district
+    category = record.get('category') or category
+    converted = convert_message_to_pattern(translated, _template)
+    return record['message'], record['lang'], translated, converted, district, category
+
+
+def _convert_chunk(args):
+    records, default_lang = args
+    for record in records:
+        record['message'] = record['message'].strip()
+        record['lang'] = record.get('lang') or default_lang
+    # Repeated messages in the slice are translated once
+    translations = _translator.translate_many([(record['message'], record['lang']) for record in records])
+    return [convert_record(record, translated) for record, translated in zip(records, translations)]
+
+
+class RecordValidator:
+    # Drops records that can't be converted. Like message_io.ImportValidator,
+    # rejected records are counted and the first few reasons kept for the
+    # report.
+    MAX_ERRORS = 20
+
+    def __init__(self):
+        self.rejected = 0
+        self.errors = []
+
+    def _reject(self, number, reason):
+        self.rejected += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"record {number}: {reason}")
+
+    def valid(self, records, first_number):
+        # records is a chunk of read_messages() output whose first record is
+        # number first_number (1-based, counted across all inputs)
+        kept = []
+        for number, record in enumerate(records, start=first_number):
+            if not isinstance(record, dict):
+                self._reject(number, "not a JSON object")
+            elif not isinstance(record.get('message'), str) or not record['message'].strip():
+                self._reject(number, "missing message")
+            else:
+                kept.append(record)
+        return kept
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_checkpoint(path):
+    # (input records handled, --output size after them), or (0, None) when
+    # starting afresh; the size is None when the output was stdout
+    if path and os.path.exists(path):
+        with open(path) as f:
+            fields = f.read().split('\t')
+            size = int(fields[1]) if len(fields) > 1 and fields[1].strip() else None
+            return int(fields[0].strip() or 0), size
+    return 0, None
+
+
+def write_checkpoint(path, done, size):
+    # Write-then-rename so a crash never leaves a truncated checkpoint
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(f"{done}\t{'' if size is None else size}")
+    os.replace(tmp, path)
+
+
+def open_output(path, done, size):
+    # When resuming, anything written after the checkpointed chunk is cut off
+    # so no message appears twice
+    if path == '-':
+        return sys.stdout
+    if not done:
+        return open(path, 'w', encoding='utf-8')
+    if size is not None:
+        os.truncate(path, size)
+    return open(path, 'a', encoding='utf-8')
+
+
+def run(args):
+    db = DatabaseManager(args.db)
+    pattern_text = db.get_pattern_text(args.pattern)
+    if not pattern_text:
+        print(f"Unknown pattern: {args.pattern}", file=sys.stderr)
+        return 1
+
+    done, size = read_checkpoint(args.checkpoint)
+    records = islice(read_messages(args.inputs, args.format), done, None)
+    validator = RecordValidator()
+    out = open_output(args.output, done, size)
+
+    # Workers convert small slices of a chunk in parallel; the next chunk is
+    # submitted before the current one is written so the pool stays busy
+    # while the database commits.
+    if args.workers > 1:
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                   initargs=(pattern_text, args.db))
+        slice_size = max(1, args.chunk_size // (args.workers * 4))
+
+        def submit(chunk):
+            return pool.map(_convert_chunk, [(part, args.lang) for part in chunks(chunk, slice_size)])
+    else:
+        pool = None
+        _init_worker(pattern_text, args.db)
+
+        def submit(chunk):
+            return [_convert_chunk((chunk, args.lang))]
+
+    start = time.perf_counter()
+    converted_count = 0
+    try:
+        pending = None
+        read = done
+        for chunk in chunks(records, args.chunk_size):
+            # Skipped records still count towards the checkpoint, so a rerun
+            # lines up with the same input
+            valid = validator.valid(chunk, read + 1)
+            read += len(chunk)
+            results = (submit(valid) if valid else [], len(chunk))
+            if pending is not None:
+                converted_count, done = _store(db, pending, out, args, converted_count, done, start)
+            pending = results
+        if pending is not None:
+            converted_count, done = _store(db, pending, out, args, converted_count, done, start)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+
+    elapsed = time.perf_counter() - start
+    rate = converted_count / elapsed if elapsed else 0
+    for error in validator.errors:
+        print(error, file=sys.stderr)
+    print(f"Converted {converted_count} messages in {elapsed:.1f}s ({rate:.0f} messages/sec), "
+          f"skipped {validator.rejected}", file=sys.stderr)
+    return 0
+
+
+def _store(db, pending, out, args, converted_count, done, start):
+    # Save first, then write the output, then checkpoint: a crash never
+    # leaves converted text in --output that the database doesn't have
+    results, consumed = pending
+    conversions = [conversion for part in results for conversion in part]
+    db.save_conversions(conversions, args.pattern)
+    for conversion in conversions:
+        out.write(conversion[3])
+        out.write('\n\n')
+    out.flush()
+    converted_count += len(conversions)
+    done += consumed
+    if args.checkpoint:
+        write_checkpoint(args.checkpoint, done, None if out is sys.stdout else out.tell())
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        print(f"{converted_count} messages, {converted_count / elapsed:.0f} messages/sec", file=sys.stderr)
+    return converted_count, done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a batch of messages without the GUI.")
+    parser.add_argument('inputs', nargs='*', help="input files ('-' or none for stdin)")
+    parser.add_argument('--format', choices=['auto', 'text', 'jsonl'], default='auto',
+                        help="text: blank-line separated messages; jsonl: one JSON object per line "
+                             "(auto picks jsonl for .jsonl/.ndjson files)")
+    parser.add_argument('--lang', default='English', help="language of messages that don't specify one")
+    parser.add_argument('--pattern', default='Default Pattern', help="name of the pattern to convert into")
+    parser.add_argument('--db', default='messages.db', help="database to save messages into")
+    parser.add_argument('--output', '-o', default='-', help="file for converted messages (default stdout)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="conversion processes")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="messages per database transaction")
+    parser.add_argument('--checkpoint', help="file recording progress, for resuming an interrupted run")
+    parser.add_argument('--quiet', '-q', action='store_true', help="only report the final rate")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
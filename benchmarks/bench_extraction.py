@@ -0,0 +1,108 @@
+# Golden-file accuracy and throughput of the field extractor used by
+# convert_message_to_pattern, compared with the original keyword checks.
+#
+#   python benchmarks/bench_extraction.py
+#
+# Exits non-zero if extraction accuracy on golden/extraction.jsonl falls
+# below MIN_ACCURACY.
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from extraction import extractor_for  # noqa: E402
+
+GOLDEN_PATH = os.path.join(ROOT, 'benchmarks', 'golden', 'extraction.jsonl')
+FIELDS = ("activity", "activist", "agenda", "venue", "time", "strength")
+MIN_ACCURACY = 0.9
+
+
+# The original extraction loop from convert_message_to_pattern
+def legacy_extract(input_text):
+    data = {
+        "activity": "Activity",
+        "activist": "Activist",
+        "agenda": "Agenda not provided",
+        "venue": "Venue not specified",
+        "time": "Time not specified",
+        "strength": "0"
+    }
+    for line in input_text.splitlines():
+        l = line.lower()
+        if "labour day rally" in l or "activity" in l:
+            data["activity"] = line.strip()
+        if "by" in l and "*" not in line:
+            data["activist"] = line.strip()
+        if "agenda" in l:
+            data["agenda"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
+        if "venue" in l:
+            data["venue"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
+        if "time" in l:
+            data["time"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
+        if "str" in l or "strength" in l:
+            data["strength"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
+    return data
+
+
+def load_golden():
+    with open(GOLDEN_PATH, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def accuracy(extract, cases):
+    correct = {field: 0 for field in FIELDS}
+    failures = []
+    for number, case in enumerate(cases, start=1):
+        values = extract(case['input'])
+        for field in FIELDS:
+            if values[field] == case['expected'][field]:
+                correct[field] += 1
+            else:
+                failures.append((number, field, case['expected'][field], values[field]))
+    return {field: correct[field] / len(cases) for field in FIELDS}, failures
+
+
+def throughput(extract, text, repeat):
+    lines = len(text.splitlines())
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract(text)
+    elapsed = time.perf_counter() - start
+    return lines * repeat / elapsed
+
+
+def main():
+    extractor = extractor_for(FIELDS)
+    new_extract = lambda text: extractor.extract(text)[0]  # noqa: E731
+    cases = load_golden()
+
+    legacy_scores, _ = accuracy(legacy_extract, cases)
+    new_scores, failures = accuracy(new_extract, cases)
+    print(f"{'field':<10} {'legacy':>7} {'engine':>7}")
+    for field in FIELDS:
+        print(f"{field:<10} {legacy_scores[field]:>7.0%} {new_scores[field]:>7.0%}")
+    overall = sum(new_scores.values()) / len(FIELDS)
+    print(f"{'overall':<10} {sum(legacy_scores.values()) / len(FIELDS):>7.0%} {overall:>7.0%}")
+    for number, field, expected, got in failures:
+        print(f"  case {number} {field}: expected {expected!r}, got {got!r}")
+
+    # Multi-kilobyte pasted bulletins: per-line cost should stay flat
+    print()
+    print(f"{'bulletin':>10} {'legacy lines/s':>15} {'engine lines/s':>15}")
+    bulletin = "\n".join(case['input'] for case in cases)
+    for copies in (1, 10, 100):
+        text = "\n\n".join([bulletin] * copies)
+        repeat = max(1, 200 // copies)
+        print(f"{len(text.encode('utf-8')) // 1024:>8}KB "
+              f"{throughput(legacy_extract, text, repeat):>15,.0f} {throughput(new_extract, text, repeat):>15,.0f}")
+
+    if overall < MIN_ACCURACY:
+        print(f"accuracy {overall:.0%} below {MIN_ACCURACY:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
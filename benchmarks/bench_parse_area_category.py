@@ -0,0 +1,80 @@
+# Compare the gazetteer matcher with the original keyword loop used by
+# parse_area_category, for growing dictionary sizes and message lengths.
+#
+#   python benchmarks/bench_parse_area_category.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gazetteer import Gazetteer  # noqa: E402
+
+
+# The original implementation, with its district list made a parameter
+def legacy_parse_area_category(text, known_districts):
+    district = "Unknown"
+    category = "Others"
+    for d in known_districts:
+        if d.lower() in text.lower():
+            district = d
+            break
+    if "labour" in text.lower():
+        category = "A"
+    elif "rally" in text.lower() or "protest" in text.lower():
+        category = "B"
+    elif "meeting" in text.lower():
+        category = "C"
+    else:
+        category = "Others"
+    return district, category
+
+
+CATEGORY_ENTRIES = [
+    ('category', 'A', ['labour']),
+    ('category', 'B', ['rally', 'protest']),
+    ('category', 'C', ['meeting']),
+]
+
+WORDS = "the a rally at press club by union workers agenda venue time strength students meeting".split()
+
+
+def make_districts(rng, count):
+    names = ["Hyd", "Karachi", "Lahore", "Islamabad", "Multan"]
+    while len(names) < count:
+        names.append(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(5, 10))).title())
+    return names
+
+
+def make_messages(rng, districts, count, words):
+    messages = []
+    for _ in range(count):
+        body = [rng.choice(WORDS) for _ in range(words)]
+        body.insert(rng.randrange(len(body)), rng.choice(districts))
+        messages.append(' '.join(body))
+    return messages
+
+
+def timed(fn, messages):
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'districts':>9} {'words':>6} {'legacy us/msg':>14} {'gazetteer us/msg':>17}")
+    for size in (5, 100, 1000):
+        districts = make_districts(rng, size)
+        gazetteer = Gazetteer([('district', d, [d]) for d in districts] + CATEGORY_ENTRIES)
+        for words in (20, 200):
+            messages = make_messages(rng, districts, 500, words)
+            legacy = timed(lambda m: legacy_parse_area_category(m, districts), messages)
+            compiled = timed(gazetteer.classify, messages)
+            print(f"{size:>9} {words:>6} {legacy:>14.1f} {compiled:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Size and query speed of the per-stage message tables (schema up to
+# migration 5) against the normalized `messages` table of migration 6, on
+# the same synthetic history. The v1 database is built first, measured, then
+# migrated in place, vacuumed and measured again.
+#
+#   python benchmarks/bench_schema_v2.py            # 1,000,000 conversions
+#   python benchmarks/bench_schema_v2.py 100000
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+class V1DatabaseManager(DatabaseManager):
+    MIGRATIONS = DatabaseManager.MIGRATIONS[:5]
+
+
+DISTRICTS = ["Hyd", "Karachi", "Sukkur", "Larkana", "Mirpurkhas", "Nawabshah", "Thatta", "Badin"]
+CATEGORIES = ["A", "B", "C", "Others"]
+LANGS = ["English", "Urdu", "Sindhi"]
+WORDS = "the a rally at press club by union workers agenda venue time strength students meeting".split()
+PATTERN = "🛑 *{} By {}*:-\n▪️ *Agenda:* {}\n▪️ *Venue* : {}\n▪️ *Time* : {}\n▪️ *Str* : {}"
+
+
+def make_conversions(rng, count, days=365):
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        timestamp = (start + timedelta(seconds=int(i * days * 86400 / count))).strftime('%Y-%m-%d %H:%M:%S')
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+        converted = PATTERN.format(*(rng.choice(WORDS) for _ in range(6)))
+        yield (text, rng.choice(LANGS), text, converted, rng.choice(DISTRICTS), rng.choice(CATEGORIES), timestamp)
+
+
+def build_v1(path, count):
+    db = V1DatabaseManager(path)
+    rng = random.Random(12)
+    conversions = list(make_conversions(rng, count))
+    with db.conn:
+        db.conn.executemany(
+            "INSERT INTO input_messages (message, lang, district, category, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [(c[0], c[1], c[4], c[5], c[6]) for c in conversions])
+        db.conn.executemany(
+            "INSERT INTO translated_messages (message, district, category, timestamp) VALUES (?, ?, ?, ?)",
+            [(c[2], c[4], c[5], c[6]) for c in conversions])
+        db.conn.executemany(
+            "INSERT INTO converted_messages (message, district, category, timestamp) VALUES (?, ?, ?, ?)",
+            [(c[3], c[4], c[5], c[6]) for c in conversions])
+    db.conn.execute("VACUUM")
+    db.close()
+
+
+def file_size(path):
+    # The WAL is checkpointed on close, so the main file is the whole database
+    return os.path.getsize(path)
+
+
+def timed(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def v1_query(conn, date=None, district=None, category=None, limit=None):
+    # query_messages (or with limit, the first query_messages_page) as it
+    # was before migration 6
+    query = "SELECT message, timestamp FROM converted_messages WHERE 1=1"
+    params = []
+    if date:
+        start = datetime.strptime(date, '%Y-%m-%d')
+        query += " AND timestamp >= ? AND timestamp < ?"
+        params += [start.strftime('%Y-%m-%d'), (start + timedelta(days=1)).strftime('%Y-%m-%d')]
+    if district:
+        query += " AND district = ?"
+        params.append(district)
+    if category:
+        query += " AND category = ?"
+        params.append(category)
+    if limit:
+        return conn.execute(query + " ORDER BY timestamp DESC, id DESC LIMIT ?", params + [limit]).fetchall()
+    return conn.execute(query + " ORDER BY timestamp DESC", params).fetchall()
+
+
+FILTERS = [
+    ('date', dict(date='2025-06-15')),
+    ('district', dict(district='Hyd')),
+    ('district+category', dict(district='Hyd', category='B')),
+    ('all three', dict(date='2025-06-15', district='Hyd', category='B')),
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    start = time.perf_counter()
+    build_v1(path, count)
+    print(f"{count} conversions, v1 built in {time.perf_counter() - start:.1f}s")
+    v1_size = file_size(path)
+    db = V1DatabaseManager(path)
+    v1_times = {name: timed(lambda f=f: v1_query(db.conn, **f)) for name, f in FILTERS}
+    v1_pages = {name: timed(lambda f=f: v1_query(db.conn, limit=100, **f)) for name, f in FILTERS}
+    db.close()
+
+    start = time.perf_counter()
+    db = DatabaseManager(path)
+    migrate_time = time.perf_counter() - start
+    db.conn.execute("VACUUM")
+    v2_times = {name: timed(lambda f=f: db.query_messages('converted_messages', **f)) for name, f in FILTERS}
+    v2_pages = {name: timed(lambda f=f: db.query_messages_page('converted_messages', limit=100, **f))
+                for name, f in FILTERS}
+    db.close()
+    v2_size = file_size(path)
+
+    print(f"migration: {migrate_time:.1f}s")
+    print(f"size: v1 {v1_size / 2**20:.1f} MiB, v2 {v2_size / 2**20:.1f} MiB ({v2_size / v1_size:.0%})")
+    print(f"{'filter':<20}{'all v1 ms':>12}{'all v2 ms':>12}{'page v1 ms':>12}{'page v2 ms':>12}")
+    for name, _ in FILTERS:
+        print(f"{name:<20}{v1_times[name]:>12.2f}{v2_times[name]:>12.2f}{v1_pages[name]:>12.2f}{v2_pages[name]:>12.2f}")
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# Seeded generator of synthetic bulletins in the shapes the app receives:
+# labelled English bulletins with emoji headers, one-line English notes, and
+# Urdu and Sindhi bulletins with native labels and place names. The same
+# seed and count always give the same corpus, so benchmark runs compare.
+#
+#   python benchmarks/corpus.py 1000 > corpus.jsonl
+import json
+import os
+import random
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gazetteer import DEFAULT_GAZETTEER_PATH  # noqa: E402
+
+SCALES = {'1k': 1000, '100k': 100000, '1M': 1000000}
+START = datetime(2025, 1, 1)
+
+# (category, English activity, Urdu activity, Sindhi activity)
+ACTIVITIES = [
+    ('A', 'Labour Day rally', 'مزدوروں کی ریلی', 'مزدورن جي ريلي'),
+    ('A', 'Labour union convention', 'مزدور کنونشن', 'مزدورن جو ڪنوينشن'),
+    ('B', 'Protest demonstration', 'احتجاجی مظاہرہ', 'احتجاج'),
+    ('B', 'Rally', 'ریلی', 'ريلي'),
+    ('B', 'Protest sit-in', 'احتجاجی دھرنا', 'احتجاجي ڌرڻو'),
+    ('C', 'Meeting', 'اجلاس', 'گڏجاڻي'),
+    ('C', 'Workers meeting', 'کارکنوں کا اجلاس', 'ڪارڪنن جي گڏجاڻي'),
+    ('Others', 'Seminar', 'سیمینار', 'سيمينار'),
+    ('Others', 'Press conference', 'پریس کانفرنس', 'پريس ڪانفرنس'),
+]
+ORGANIZERS = ['PTI', 'PPP', 'MQM-P', 'JI', 'TLP', 'Sindh Teachers Association', 'Lady Health Workers Union',
+              'Trade Union Federation', 'Students Federation', 'Traders Action Committee', 'Farmers Ittehad']
+AGENDAS = ['Against load shedding', 'Regularization of contract employees', 'Increase in wages',
+           'Against price hike', 'Water shortage', 'Release of salaries', 'Restoration of student unions']
+AGENDAS_UR = ['لوڈ شیڈنگ کے خلاف', 'کنٹریکٹ ملازمین کی مستقلی', 'تنخواہوں میں اضافہ', 'مہنگائی کے خلاف']
+AGENDAS_SD = ['لوڊ شيڊنگ خلاف', 'پگهارن ۾ واڌ', 'پاڻي جي کوٽ', 'مهانگائي خلاف']
+VENUES = ['Press Club', 'Clock Tower', 'Shahbaz Building', 'Circuit House', 'Hyderi Chowk', 'Main Bazaar',
+          'Party office', 'DC office']
+LANGS = [('English', 0.6), ('Urdu', 0.25), ('Sindhi', 0.15)]
+
+
+def load_districts(path=DEFAULT_GAZETTEER_PATH):
+    # (name, aliases) of every district in the gazetteer, in file order
+    districts = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.strip().split('\t')
+            if len(fields) >= 2 and fields[0] == 'district':
+                aliases = fields[2].split('|') if len(fields) > 2 else []
+                districts.append((fields[1], aliases))
+    return districts
+
+
+def _latin(aliases):
+    return [alias for alias in aliases if alias.isascii()]
+
+
+def _native(aliases):
+    return [alias for alias in aliases if not alias.isascii()]
+
+
+def _time(rng):
+    hour = rng.randint(9, 20)
+    if rng.random() < 0.5:
+        return f"{hour:02d}{rng.choice(['00', '30'])} hrs"
+    return f"{(hour - 1) % 12 + 1}:{rng.choice(['00', '30'])} {'am' if hour < 12 else 'pm'}"
+
+
+def _english(rng, place, activity, organizer):
+    venue = f"{rng.choice(VENUES)}, {place}"
+    strength = rng.randint(10, 2000)
+    shape = rng.random()
+    if shape < 0.6:
+        header = f"🛑 *{activity} By {organizer}*:-" if rng.random() < 0.5 else f"{activity} by {organizer}"
+        return (f"{header}\n▪️ *Agenda:* {rng.choice(AGENDAS)}\n▪️ *Venue* : {venue}\n"
+                f"▪️ *Time* : {_time(rng)}\n▪️ *Str* : {strength}")
+    if shape < 0.9:
+        return (f"{activity} by {organizer} at {venue} at {_time(rng)}, {strength} participants. "
+                f"Agenda: {rng.choice(AGENDAS)}")
+    # Longer forwarded bulletin: several paragraphs about the same event
+    lines = [f"*{place} update*", f"{activity} by {organizer}", f"Agenda: {rng.choice(AGENDAS)}",
+             f"Venue: {venue}", f"Time: {_time(rng)}", f"Strength: {strength}"]
+    lines += [f"Speakers demanded {rng.choice(AGENDAS).lower()}." for _ in range(rng.randint(2, 6))]
+    return '\n'.join(lines)
+
+
+def _urdu(rng, place, activity, organizer):
+    return (f"پروگرام: {activity}\nمنجانب: {organizer}\nایجنڈا: {rng.choice(AGENDAS_UR)}\n"
+            f"مقام: {rng.choice(VENUES)} {place}\nوقت: {_time(rng)}\nتعداد: {rng.randint(10, 2000)}")
+
+
+def _sindhi(rng, place, activity, organizer):
+    return (f"🛑 {activity}\nطرفان: {organizer}\nايجنڊا: {rng.choice(AGENDAS_SD)}\n"
+            f"هنڌ: {rng.choice(VENUES)} {place}\nٽائيم: {_time(rng)}\nشرڪت ڪندڙ: {rng.randint(10, 2000)}")
+
+
+def bulletins(count, seed=7, days=365):
+    # Yields dicts with the bulletin text ('message'), its 'lang', when it
+    # was received ('created_at', epoch seconds spread over `days` from
+    # START) and the 'district'/'category' it is about. Districts follow a
+    # long-tailed distribution (a few busy districts, many quiet ones); about
+    # one in ten bulletins names no district.
+    rng = random.Random(seed)
+    districts = load_districts()
+    district_weights = [1 / rank for rank in range(1, len(districts) + 1)]
+    langs, lang_weights = zip(*LANGS)
+    start = int(START.timestamp())
+    for i in range(count):
+        lang = rng.choices(langs, lang_weights)[0]
+        category, *activities = rng.choice(ACTIVITIES)
+        organizer = rng.choice(ORGANIZERS)
+        if rng.random() < 0.1:
+            district, place = "Unknown", rng.choice(VENUES)
+        else:
+            district, aliases = rng.choices(districts, district_weights)[0]
+            names = _latin(aliases) if lang == 'English' else _native(aliases)
+            place = rng.choice(names or [district])
+        if lang == 'English':
+            message = _english(rng, place, activities[0], organizer)
+        elif lang == 'Urdu':
+            message = _urdu(rng, place, activities[1], organizer)
+        else:
+            message = _sindhi(rng, place, activities[2], organizer)
+        yield {'message': message, 'lang': lang, 'created_at': start + int(i * days * 86400 / count),
+               'district': district, 'category': category}
+
+
+def main():
+    scale = sys.argv[1] if len(sys.argv) > 1 else '1k'
+    count = SCALES[scale] if scale in SCALES else int(scale)
+    for bulletin in bulletins(count):
+        print(json.dumps(bulletin, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
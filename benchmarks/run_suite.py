@@ -0,0 +1,256 @@
+# Headless benchmark suite for the conversion pipeline and DatabaseManager,
+# run on the seeded corpus from corpus.py. Results are written as JSON so
+# runs can be compared; with --compare, metrics that got worse than the
+# baseline by more than --threshold are listed and the exit status is 1.
+#
+#   python benchmarks/run_suite.py --scale 1k --output before.json
+#   python benchmarks/run_suite.py --scale 1k --output after.json --compare before.json
+#   python benchmarks/run_suite.py --scale 1M --only db
+#
+# Every timing is the best of several repeats, which is the most stable
+# figure on a busy machine; compare runs made at the same scale only.
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from itertools import islice
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import SCALES, START, bulletins  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+from pipeline import convert_message_to_pattern, parse_area_category, translate_to_english  # noqa: E402
+
+# Size of the corpus sample the per-message microbenchmarks run over
+PIPELINE_SAMPLE = 1000
+# Rows saved one conversion at a time / in save_conversions batches
+SINGLE_INSERTS = 500
+BATCH_INSERTS = 20000
+BATCH_SIZE = 1000
+# Database sizes are recorded whenever the row count reaches one of these
+SIZE_CHECKPOINTS = (1000, 10000, 100000, 1000000)
+FILTER_VALUES = {'date': START.strftime('%Y') + '-06-15', 'district': 'Hyd', 'category': 'B'}
+DEFAULT_THRESHOLD = 0.15
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def per_call(fn, repeat=5, min_time=0.05):
+    # Best seconds per call, timing enough calls together that each sample
+    # takes at least min_time; sub-millisecond queries are too noisy alone
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+    return best_of(lambda: [fn() for _ in range(number)], repeat) / number
+
+
+class Results:
+    # name -> {'value', 'unit', 'better': 'lower' or 'higher'}
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better='lower'):
+        self.metrics[name] = {'value': value, 'unit': unit, 'better': better}
+        print(f"{name:<44}{value:>14,.3f} {unit}", flush=True)
+
+
+def bench_pipeline(results, sample):
+    # Per-message cost over the sample, with the first built-in pattern
+    db = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'pipeline.db'))
+    template = db.get_pattern_template(db.get_patterns()[0])
+    db.close()
+    messages = [bulletin['message'] for bulletin in sample]
+
+    def per_message(fn, repeat=5):
+        return best_of(lambda: [fn(message) for message in messages], repeat) / len(messages) * 1e6
+
+    results.add('pipeline.parse_area_category', per_message(parse_area_category), 'us/msg')
+    results.add('pipeline.convert_message_to_pattern',
+                per_message(lambda message: convert_message_to_pattern(message, template)), 'us/msg')
+
+    def end_to_end(bulletin):
+        translated = translate_to_english(bulletin['message'], bulletin['lang'])
+        parse_area_category(translated)
+        convert_message_to_pattern(translated, template)
+
+    results.add('pipeline.end_to_end', best_of(lambda: [end_to_end(b) for b in sample], 5) / len(sample) * 1e6,
+                'us/msg')
+    correct = sum(parse_area_category(b['message']) == (b['district'], b['category']) for b in sample)
+    results.add('pipeline.classify_accuracy', correct / len(sample), 'fraction', better='higher')
+
+
+def _conversion(bulletin):
+    message = bulletin['message']
+    return (message, bulletin['lang'], message, message, bulletin['district'], bulletin['category'])
+
+
+def _file_size(db):
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db.db_name)
+
+
+def bench_inserts(results, workdir, sample):
+    # The app's write paths: one conversion per transaction (write-behind off,
+    # so every save commits) and save_conversions batches like batch_convert.py
+    db = DatabaseManager(os.path.join(workdir, 'inserts.db'))
+    rows = [_conversion(b) for b in islice(sample, SINGLE_INSERTS)]
+    start = time.perf_counter()
+    for row in rows:
+        db.save_conversion(*row)
+    results.add('db.save_conversion', len(rows) / (time.perf_counter() - start), 'rows/s', better='higher')
+    db.close()
+
+    # As the app saves: through the write-behind queue, flushed at the end
+    db = DatabaseManager(os.path.join(workdir, 'inserts.db'), write_behind=True)
+    start = time.perf_counter()
+    for row in rows:
+        db.save_conversion(*row)
+    db.flush()
+    results.add('db.save_conversion.write_behind', len(rows) / (time.perf_counter() - start), 'rows/s',
+                better='higher')
+
+    rows = [_conversion(b) for b in bulletins(BATCH_INSERTS, seed=8)]
+    start = time.perf_counter()
+    for i in range(0, len(rows), BATCH_SIZE):
+        db.save_conversions(rows[i:i + BATCH_SIZE])
+    results.add('db.save_conversions', len(rows) / (time.perf_counter() - start), 'rows/s', better='higher')
+    # Near-duplicate lookup against the messages just saved, which have
+    # their input text (the bulk-loaded query database has only converted text)
+    forwarded = rows[len(rows) // 2][0] + '\n-- forwarded'
+    results.add('db.find_duplicate', per_call(lambda: db.find_duplicate(forwarded)) * 1000, 'ms')
+    db.close()
+
+
+def build_database(results, path, count):
+    # Bulk-load the corpus with import_messages, recording the file size at
+    # every SIZE_CHECKPOINTS row count on the way
+    db = DatabaseManager(path)
+    rows = ((b['created_at'], b['lang'], b['district'], b['category'], b['message']) for b in bulletins(count))
+    loaded = 0
+    elapsed = 0
+    for checkpoint in [c for c in SIZE_CHECKPOINTS if c < count] + [count]:
+        start = time.perf_counter()
+        loaded += db.import_messages(islice(rows, checkpoint - loaded))
+        elapsed += time.perf_counter() - start
+        results.add(f'db.size.bytes_per_row@{checkpoint}', _file_size(db) / loaded, 'bytes/row')
+    results.add('db.import_messages', loaded / elapsed, 'rows/s', better='higher')
+    db.close()
+
+
+def filter_combinations():
+    # ('none', {}), ('date', {...}), ..., ('date+district+category', {...})
+    names = list(FILTER_VALUES)
+    for mask in range(2 ** len(names)):
+        chosen = [name for i, name in enumerate(names) if mask & (1 << i)]
+        yield '+'.join(chosen) or 'none', {name: FILTER_VALUES[name] for name in chosen}
+
+
+def bench_queries(results, path, count):
+    db = DatabaseManager(path)
+    # Full results get expensive at scale; fewer repeats keep the run bounded
+    repeat = 5 if count <= 100000 else 2
+    for name, filters in filter_combinations():
+        results.add(f'db.query_messages[{name}]',
+                    per_call(lambda: db.query_messages('converted_messages', **filters), repeat) * 1000, 'ms')
+        results.add(f'db.query_messages_page[{name}]',
+                    per_call(lambda: db.query_messages_page('converted_messages', limit=100, **filters)) * 1000,
+                    'ms')
+    results.add('db.search_messages', per_call(lambda: db.search_messages('press club rally')) * 1000, 'ms')
+    day = FILTER_VALUES['date']
+    results.add('db.stats', per_call(lambda: db.stats(day[:4] + '-01-01', day[:4] + '-12-31')) * 1000, 'ms')
+    db.close()
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'machine': platform.machine()}
+
+
+def compare(metrics, baseline, threshold):
+    # (name, old, new, change) for metrics worse than the baseline by more
+    # than threshold, as a fraction of the old value
+    regressions = []
+    for name, metric in metrics.items():
+        old = baseline.get(name)
+        if old is None or not old['value']:
+            continue
+        change = (metric['value'] - old['value']) / old['value']
+        worse = change if metric['better'] == 'lower' else -change
+        if worse > threshold:
+            regressions.append((name, old['value'], metric['value'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline and the database.")
+    parser.add_argument('--scale', choices=list(SCALES), default='100k', help="corpus size for the database benchmarks")
+    parser.add_argument('--only', choices=['pipeline', 'db'], help="run one group of benchmarks")
+    parser.add_argument('--output', default='benchmark-results.json', help="where to write the results")
+    parser.add_argument('--compare', help="earlier results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    count = SCALES[args.scale]
+    results = Results()
+    started = time.time()
+    sample = list(bulletins(PIPELINE_SAMPLE))
+    if args.only in (None, 'pipeline'):
+        bench_pipeline(results, sample)
+    if args.only in (None, 'db'):
+        workdir = tempfile.mkdtemp()
+        try:
+            bench_inserts(results, workdir, sample)
+            path = os.path.join(workdir, 'suite.db')
+            build_database(results, path, count)
+            bench_queries(results, path, count)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'scale': args.scale, 'rows': count, 'started': datetime.fromtimestamp(started).isoformat(),
+              'seconds': round(time.time() - started, 1), 'environment': environment(), 'metrics': results.metrics}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f"warning: baseline was run at scale {baseline.get('scale')}, this run at {args.scale}")
+        regressions = compare(results.metrics, baseline['metrics'], args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:,.3f} -> {new:,.3f} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1373 @@
+import glob
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from near_duplicates import band_keys, jaccard, shingles
+from pattern_template import PatternTemplate, TemplateCache
+from profiling import profiler
+
+
+def draft_hash(message, lang, district, category):
+    return hashlib.sha1(f"{message}\0{lang}\0{district}\0{category}".encode('utf-8')).hexdigest()
+
+
+# Message text in the archive files is stored zlib-compressed; both are
+# registered as SQL functions on every connection
+def deflate(text):
+    return None if text is None else zlib.compress(text.encode('utf-8'), 9)
+
+
+def inflate(data):
+    return None if data is None else zlib.decompress(data).decode('utf-8')
+
+
+# Database Helper Class. Every public method is timed as stage 'db.<method>'
+# while the profiler is enabled (see profiling.py).
+@profiler.timed_methods('db')
+class DatabaseManager:
+    # Schema migrations, applied in order. The database's PRAGMA user_version
+    # records how many of them have already run, so append new steps here and
+    # never edit or reorder existing ones.
+    MIGRATIONS = [
+        # 1: indexes for the log filters (date range, district, category)
+        [
+            "CREATE INDEX IF NOT EXISTS idx_input_messages_timestamp ON input_messages (timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_input_messages_district ON input_messages (district, category, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_input_messages_category ON input_messages (category, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_translated_messages_timestamp ON translated_messages (timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_translated_messages_district ON translated_messages (district, category, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_translated_messages_category ON translated_messages (category, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_converted_messages_timestamp ON converted_messages (timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_converted_messages_district ON converted_messages (district, category, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_converted_messages_category ON converted_messages (category, timestamp)",
+        ],
+        # 2: full-text search over the message column of each message table.
+        # External-content FTS5 tables kept in sync by triggers; 'rebuild'
+        # backfills rows that existed before this step.
+        [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS input_messages_fts USING fts5("
+            "message, content='input_messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            "CREATE TRIGGER IF NOT EXISTS input_messages_fts_insert AFTER INSERT ON input_messages BEGIN "
+            "INSERT INTO input_messages_fts (rowid, message) VALUES (new.id, new.message); END",
+            "CREATE TRIGGER IF NOT EXISTS input_messages_fts_delete AFTER DELETE ON input_messages BEGIN "
+            "INSERT INTO input_messages_fts (input_messages_fts, rowid, message) VALUES ('delete', old.id, old.message); END",
+            "CREATE TRIGGER IF NOT EXISTS input_messages_fts_update AFTER UPDATE OF message ON input_messages BEGIN "
+            "INSERT INTO input_messages_fts (input_messages_fts, rowid, message) VALUES ('delete', old.id, old.message); "
+            "INSERT INTO input_messages_fts (rowid, message) VALUES (new.id, new.message); END",
+            "INSERT INTO input_messages_fts (input_messages_fts) VALUES ('rebuild')",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS translated_messages_fts USING fts5("
+            "message, content='translated_messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            "CREATE TRIGGER IF NOT EXISTS translated_messages_fts_insert AFTER INSERT ON translated_messages BEGIN "
+            "INSERT INTO translated_messages_fts (rowid, message) VALUES (new.id, new.message); END",
+            "CREATE TRIGGER IF NOT EXISTS translated_messages_fts_delete AFTER DELETE ON translated_messages BEGIN "
+            "INSERT INTO translated_messages_fts (translated_messages_fts, rowid, message) VALUES ('delete', old.id, old.message); END",
+            "CREATE TRIGGER IF NOT EXISTS translated_messages_fts_update AFTER UPDATE OF message ON translated_messages BEGIN "
+            "INSERT INTO translated_messages_fts (translated_messages_fts, rowid, message) VALUES ('delete', old.id, old.message); "
+            "INSERT INTO translated_messages_fts (rowid, message) VALUES (new.id, new.message); END",
+            "INSERT INTO translated_messages_fts (translated_messages_fts) VALUES ('rebuild')",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS converted_messages_fts USING fts5("
+            "message, content='converted_messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            "CREATE TRIGGER IF NOT EXISTS converted_messages_fts_insert AFTER INSERT ON converted_messages BEGIN "
+            "INSERT INTO converted_messages_fts (rowid, message) VALUES (new.id, new.message); END",
+            "CREATE TRIGGER IF NOT EXISTS converted_messages_fts_delete AFTER DELETE ON converted_messages BEGIN "
+            "INSERT INTO converted_messages_fts (converted_messages_fts, rowid, message) VALUES ('delete', old.id, old.message); END",
+            "CREATE TRIGGER IF NOT EXISTS converted_messages_fts_update AFTER UPDATE OF message ON converted_messages BEGIN "
+            "INSERT INTO converted_messages_fts (converted_messages_fts, rowid, message) VALUES ('delete', old.id, old.message); "
+            "INSERT INTO converted_messages_fts (rowid, message) VALUES (new.id, new.message); END",
+            "INSERT INTO converted_messages_fts (converted_messages_fts) VALUES ('rebuild')",
+        ],
+        # 3: pattern version, bumped on every edit to key the template cache
+        [
+            "ALTER TABLE patterns ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+        ],
+        # 4: persistent tier of the translation cache (see translation_cache.py)
+        [
+            "CREATE TABLE IF NOT EXISTS translation_cache ("
+            "key TEXT PRIMARY KEY, translation TEXT, last_used INTEGER) WITHOUT ROWID",
+            "CREATE INDEX IF NOT EXISTS idx_translation_cache_last_used ON translation_cache (last_used)",
+        ],
+        # 5: unsent drafts, one row per editing session, kept out of the
+        # input_messages history
+        [
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            "session_id TEXT PRIMARY KEY, message TEXT, lang TEXT, district TEXT, category TEXT, "
+            "content_hash TEXT, updated_at TEXT)",
+        ],
+        # 6: normalized storage. One `messages` row per conversion ties the
+        # input, translation and converted text together; district, category
+        # and language are small lookup tables referenced by id, and
+        # created_at is epoch seconds. Existing rows are copied over, pairing
+        # the three legacy rows written by one conversion (same timestamp,
+        # district and category, in insertion order); unpaired rows keep just
+        # their own stage. The old tables are replaced by views of the same
+        # name and columns, insertable through INSTEAD OF triggers.
+        [
+            "CREATE TABLE IF NOT EXISTS districts (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+            "CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+            "CREATE TABLE IF NOT EXISTS languages (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY, created_at INTEGER NOT NULL, "
+            "lang_id INTEGER REFERENCES languages (id), district_id INTEGER REFERENCES districts (id), "
+            "category_id INTEGER REFERENCES categories (id), pattern_id INTEGER REFERENCES patterns (id), "
+            "input TEXT, translated TEXT, converted TEXT)",
+            "INSERT OR IGNORE INTO districts (name) "
+            "SELECT district FROM input_messages WHERE district IS NOT NULL UNION "
+            "SELECT district FROM translated_messages WHERE district IS NOT NULL UNION "
+            "SELECT district FROM converted_messages WHERE district IS NOT NULL",
+            "INSERT OR IGNORE INTO categories (name) "
+            "SELECT category FROM input_messages WHERE category IS NOT NULL UNION "
+            "SELECT category FROM translated_messages WHERE category IS NOT NULL UNION "
+            "SELECT category FROM converted_messages WHERE category IS NOT NULL",
+            "INSERT OR IGNORE INTO languages (name) SELECT DISTINCT lang FROM input_messages WHERE lang IS NOT NULL",
+            "CREATE TEMP TABLE IF NOT EXISTS legacy_input AS SELECT id, message, lang, "
+            "coalesce(timestamp, '1970-01-01 00:00:00') AS timestamp, coalesce(district, '') AS district, "
+            "coalesce(category, '') AS category, "
+            "ROW_NUMBER() OVER (PARTITION BY timestamp, district, category ORDER BY id) AS n FROM input_messages",
+            "CREATE INDEX IF NOT EXISTS temp.legacy_input_key ON legacy_input (timestamp, district, category, n)",
+            "CREATE TEMP TABLE IF NOT EXISTS legacy_translated AS SELECT id, message, NULL AS lang, "
+            "coalesce(timestamp, '1970-01-01 00:00:00') AS timestamp, coalesce(district, '') AS district, "
+            "coalesce(category, '') AS category, "
+            "ROW_NUMBER() OVER (PARTITION BY timestamp, district, category ORDER BY id) AS n FROM translated_messages",
+            "CREATE INDEX IF NOT EXISTS temp.legacy_translated_key ON legacy_translated (timestamp, district, category, n)",
+            "CREATE TEMP TABLE IF NOT EXISTS legacy_converted AS SELECT id, message, NULL AS lang, "
+            "coalesce(timestamp, '1970-01-01 00:00:00') AS timestamp, coalesce(district, '') AS district, "
+            "coalesce(category, '') AS category, "
+            "ROW_NUMBER() OVER (PARTITION BY timestamp, district, category ORDER BY id) AS n FROM converted_messages",
+            "CREATE INDEX IF NOT EXISTS temp.legacy_converted_key ON legacy_converted (timestamp, district, category, n)",
+            "CREATE TEMP TABLE IF NOT EXISTS legacy_keys AS SELECT timestamp, district, category, n, MIN(id) AS first_id FROM ("
+            "SELECT timestamp, district, category, n, id FROM legacy_input UNION ALL "
+            "SELECT timestamp, district, category, n, id FROM legacy_translated UNION ALL "
+            "SELECT timestamp, district, category, n, id FROM legacy_converted) "
+            "GROUP BY timestamp, district, category, n",
+            "INSERT INTO messages (created_at, lang_id, district_id, category_id, input, translated, converted) "
+            "SELECT CAST(strftime('%s', k.timestamp, 'utc') AS INTEGER), "
+            "(SELECT id FROM languages WHERE name = i.lang), "
+            "(SELECT id FROM districts WHERE name = k.district), "
+            "(SELECT id FROM categories WHERE name = k.category), "
+            "i.message, t.message, c.message FROM legacy_keys k "
+            "LEFT JOIN legacy_input i ON (i.timestamp, i.district, i.category, i.n) = "
+            "(k.timestamp, k.district, k.category, k.n) "
+            "LEFT JOIN legacy_translated t ON (t.timestamp, t.district, t.category, t.n) = "
+            "(k.timestamp, k.district, k.category, k.n) "
+            "LEFT JOIN legacy_converted c ON (c.timestamp, c.district, c.category, c.n) = "
+            "(k.timestamp, k.district, k.category, k.n) "
+            "ORDER BY k.timestamp, k.first_id",
+            "DROP TABLE temp.legacy_keys",
+            "DROP TABLE temp.legacy_input",
+            "DROP TABLE temp.legacy_translated",
+            "DROP TABLE temp.legacy_converted",
+            "DROP TABLE input_messages_fts",
+            "DROP TABLE translated_messages_fts",
+            "DROP TABLE converted_messages_fts",
+            "DROP TABLE input_messages",
+            "DROP TABLE translated_messages",
+            "DROP TABLE converted_messages",
+            "CREATE VIEW IF NOT EXISTS input_messages AS SELECT m.id AS id, m.input AS message, l.name AS lang, "
+            "d.name AS district, c.name AS category, "
+            "datetime(m.created_at, 'unixepoch', 'localtime') AS timestamp "
+            "FROM messages m LEFT JOIN languages l ON l.id = m.lang_id LEFT JOIN districts d ON d.id = m.district_id "
+            "LEFT JOIN categories c ON c.id = m.category_id WHERE m.input IS NOT NULL",
+            "CREATE TRIGGER IF NOT EXISTS input_messages_insert INSTEAD OF INSERT ON input_messages BEGIN "
+            "INSERT OR IGNORE INTO languages (name) SELECT new.lang WHERE new.lang IS NOT NULL; "
+            "INSERT OR IGNORE INTO districts (name) SELECT new.district WHERE new.district IS NOT NULL; "
+            "INSERT OR IGNORE INTO categories (name) SELECT new.category WHERE new.category IS NOT NULL; "
+            "INSERT INTO messages (created_at, lang_id, district_id, category_id, input) VALUES ("
+            "coalesce(CAST(strftime('%s', new.timestamp, 'utc') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)), "
+            "(SELECT id FROM languages WHERE name = new.lang), "
+            "(SELECT id FROM districts WHERE name = new.district), "
+            "(SELECT id FROM categories WHERE name = new.category), new.message); END",
+            "CREATE VIEW IF NOT EXISTS translated_messages AS SELECT m.id AS id, m.translated AS message, "
+            "d.name AS district, c.name AS category, "
+            "datetime(m.created_at, 'unixepoch', 'localtime') AS timestamp "
+            "FROM messages m LEFT JOIN districts d ON d.id = m.district_id "
+            "LEFT JOIN categories c ON c.id = m.category_id WHERE m.translated IS NOT NULL",
+            "CREATE TRIGGER IF NOT EXISTS translated_messages_insert INSTEAD OF INSERT ON translated_messages BEGIN "
+            "INSERT OR IGNORE INTO districts (name) SELECT new.district WHERE new.district IS NOT NULL; "
+            "INSERT OR IGNORE INTO categories (name) SELECT new.category WHERE new.category IS NOT NULL; "
+            "INSERT INTO messages (created_at, district_id, category_id, translated) VALUES ("
+            "coalesce(CAST(strftime('%s', new.timestamp, 'utc') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)), "
+            "(SELECT id FROM districts WHERE name = new.district), "
+            "(SELECT id FROM categories WHERE name = new.category), new.message); END",
+            "CREATE VIEW IF NOT EXISTS converted_messages AS SELECT m.id AS id, m.converted AS message, "
+            "d.name AS district, c.name AS category, "
+            "datetime(m.created_at, 'unixepoch', 'localtime') AS timestamp "
+            "FROM messages m LEFT JOIN districts d ON d.id = m.district_id "
+            "LEFT JOIN categories c ON c.id = m.category_id WHERE m.converted IS NOT NULL",
+            "CREATE TRIGGER IF NOT EXISTS converted_messages_insert INSTEAD OF INSERT ON converted_messages BEGIN "
+            "INSERT OR IGNORE INTO districts (name) SELECT new.district WHERE new.district IS NOT NULL; "
+            "INSERT OR IGNORE INTO categories (name) SELECT new.category WHERE new.category IS NOT NULL; "
+            "INSERT INTO messages (created_at, district_id, category_id, converted) VALUES ("
+            "coalesce(CAST(strftime('%s', new.timestamp, 'utc') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)), "
+            "(SELECT id FROM districts WHERE name = new.district), "
+            "(SELECT id FROM categories WHERE name = new.category), new.message); END",
+            "CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages (created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_district ON messages (district_id, category_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_district_time ON messages (district_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_category ON messages (category_id, created_at)",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+            "input, translated, converted, content='messages', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')",
+            "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+            "INSERT INTO messages_fts (rowid, input, translated, converted) "
+            "VALUES (new.id, new.input, new.translated, new.converted); END",
+            "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+            "INSERT INTO messages_fts (messages_fts, rowid, input, translated, converted) "
+            "VALUES ('delete', old.id, old.input, old.translated, old.converted); END",
+            "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF input, translated, converted ON messages BEGIN "
+            "INSERT INTO messages_fts (messages_fts, rowid, input, translated, converted) "
+            "VALUES ('delete', old.id, old.input, old.translated, old.converted); "
+            "INSERT INTO messages_fts (rowid, input, translated, converted) "
+            "VALUES (new.id, new.input, new.translated, new.converted); END",
+            "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+        ],
+        # 7: converted messages counted per local day, district and category,
+        # kept current by a trigger so stats() never scans messages. Archiving
+        # leaves the counts alone. A missing district or category counts as 0.
+        [
+            "CREATE TABLE IF NOT EXISTS daily_counts ("
+            "day TEXT NOT NULL, district_id INTEGER NOT NULL, category_id INTEGER NOT NULL, "
+            "count INTEGER NOT NULL, PRIMARY KEY (day, district_id, category_id)) WITHOUT ROWID",
+            "CREATE TRIGGER IF NOT EXISTS daily_counts_insert AFTER INSERT ON messages WHEN new.converted IS NOT NULL BEGIN "
+            "INSERT INTO daily_counts (day, district_id, category_id, count) VALUES ("
+            "date(new.created_at, 'unixepoch', 'localtime'), coalesce(new.district_id, 0), "
+            "coalesce(new.category_id, 0), 1) "
+            "ON CONFLICT (day, district_id, category_id) DO UPDATE SET count = count + 1; END",
+            "INSERT INTO daily_counts (day, district_id, category_id, count) "
+            "SELECT date(created_at, 'unixepoch', 'localtime'), coalesce(district_id, 0), coalesce(category_id, 0), "
+            "COUNT(*) FROM messages WHERE converted IS NOT NULL GROUP BY 1, 2, 3",
+        ],
+        # 8: set while import_messages() has the messages indexes and
+        # triggers dropped; holds the last message id from before the import
+        [
+            "CREATE TABLE IF NOT EXISTS deferred_import (first_id INTEGER NOT NULL)",
+        ],
+        # 9: near-duplicate index over input messages, one row per MinHash
+        # band key of each message (see near_duplicates.py). create_tables()
+        # fingerprints the rows that predate it.
+        [
+            "CREATE TABLE IF NOT EXISTS message_fingerprints (band_key INTEGER NOT NULL, "
+            "message_id INTEGER NOT NULL, PRIMARY KEY (band_key, message_id)) WITHOUT ROWID",
+        ],
+        # 10: AUTOINCREMENT message ids. Plain INTEGER PRIMARY KEY ids were
+        # reused once archiving emptied the table, colliding with archived
+        # rows. SQLite can't alter a column, so the table is rebuilt and its
+        # indexes and triggers recreated; the views and the FTS index refer
+        # to it by name (legacy_alter_table keeps the rename from checking
+        # them while `messages` is missing). create_tables() then moves the
+        # id sequence past the archived ids.
+        [
+            "CREATE TABLE IF NOT EXISTS messages_new ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at INTEGER NOT NULL, "
+            "lang_id INTEGER REFERENCES languages (id), district_id INTEGER REFERENCES districts (id), "
+            "category_id INTEGER REFERENCES categories (id), pattern_id INTEGER REFERENCES patterns (id), "
+            "input TEXT, translated TEXT, converted TEXT)",
+            "INSERT INTO messages_new (id, created_at, lang_id, district_id, category_id, pattern_id, "
+            "input, translated, converted) "
+            "SELECT id, created_at, lang_id, district_id, category_id, pattern_id, input, translated, converted "
+            "FROM messages ORDER BY id",
+            "DROP TABLE messages",
+            "PRAGMA legacy_alter_table = ON",
+            "ALTER TABLE messages_new RENAME TO messages",
+            "PRAGMA legacy_alter_table = OFF",
+            "CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages (created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_district ON messages (district_id, category_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_district_time ON messages (district_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_category ON messages (category_id, created_at)",
+            "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+            "INSERT INTO messages_fts (rowid, input, translated, converted) "
+            "VALUES (new.id, new.input, new.translated, new.converted); END",
+            "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+            "INSERT INTO messages_fts (messages_fts, rowid, input, translated, converted) "
+            "VALUES ('delete', old.id, old.input, old.translated, old.converted); END",
+            "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF input, translated, converted ON messages BEGIN "
+            "INSERT INTO messages_fts (messages_fts, rowid, input, translated, converted) "
+            "VALUES ('delete', old.id, old.input, old.translated, old.converted); "
+            "INSERT INTO messages_fts (rowid, input, translated, converted) "
+            "VALUES (new.id, new.input, new.translated, new.converted); END",
+            "CREATE TRIGGER IF NOT EXISTS daily_counts_insert AFTER INSERT ON messages WHEN new.converted IS NOT NULL BEGIN "
+            "INSERT INTO daily_counts (day, district_id, category_id, count) VALUES ("
+            "date(new.created_at, 'unixepoch', 'localtime'), coalesce(new.district_id, 0), "
+            "coalesce(new.category_id, 0), 1) "
+            "ON CONFLICT (day, district_id, category_id) DO UPDATE SET count = count + 1; END",
+        ],
+        # 11: the version of the pattern a message was converted with, so
+        # find_duplicate() only reuses conversions the current pattern would
+        # still produce (older rows have none and are never reused), and the
+        # message a near-duplicate's conversion was reused from
+        [
+            "ALTER TABLE messages ADD COLUMN pattern_version INTEGER",
+            "ALTER TABLE messages ADD COLUMN duplicate_of INTEGER REFERENCES messages (id)",
+        ],
+    ]
+    FINGERPRINT_MIGRATION = 9
+    ID_SEQUENCE_MIGRATION = 10
+
+    MESSAGE_TABLES = ('input_messages', 'translated_messages', 'converted_messages')
+    # Column of `messages` holding each message table's text
+    STAGE_COLUMNS = {'input_messages': 'input', 'translated_messages': 'translated', 'converted_messages': 'converted'}
+
+    # Max number of queued write units flushed together in one transaction
+    WRITE_BATCH_SIZE = 200
+    # When another connection holds the write lock past the busy timeout
+    # (e.g. manage_db running a VACUUM), the writer waits this long between
+    # attempts, for up to BUSY_WAIT seconds, before giving up on a write
+    BUSY_RETRY_DELAY = 0.5
+    BUSY_WAIT = 120
+
+    # Secondary indexes of `messages` and the insert triggers maintaining
+    # messages_fts and daily_counts (as created by migrations 6 and 7).
+    # import_messages() drops them while loading and catches up in bulk.
+    MESSAGE_INDEXES = [
+        "CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_district ON messages (district_id, category_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_district_time ON messages (district_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_category ON messages (category_id, created_at)",
+    ]
+    MESSAGE_INSERT_TRIGGERS = [
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+        "INSERT INTO messages_fts (rowid, input, translated, converted) "
+        "VALUES (new.id, new.input, new.translated, new.converted); END",
+        "CREATE TRIGGER IF NOT EXISTS daily_counts_insert AFTER INSERT ON messages "
+        "WHEN new.converted IS NOT NULL BEGIN "
+        "INSERT INTO daily_counts (day, district_id, category_id, count) VALUES ("
+        "date(new.created_at, 'unixepoch', 'localtime'), coalesce(new.district_id, 0), "
+        "coalesce(new.category_id, 0), 1) "
+        "ON CONFLICT (day, district_id, category_id) DO UPDATE SET count = count + 1; END",
+    ]
+
+    # archive_messages() moves messages older than this many days out of the
+    # main database into one archive file per month
+    ARCHIVE_AFTER_DAYS = 90
+    # find_duplicate(): minimum shingle similarity for a near-duplicate, and
+    # how many of the newest messages per band key are compared; the latter
+    # caps the lookup cost however many messages are stored
+    DUPLICATE_THRESHOLD = 0.7
+    DUPLICATE_CANDIDATES_PER_BAND = 16
+    # Archives are attached on demand; SQLite allows 10 attached databases
+    MAX_ATTACHED_ARCHIVES = 4
+    # Same layout as `messages` with compressed text, and a contentless FTS
+    # index (terms only, no copy of the text)
+    ARCHIVE_SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS {schema}.messages ("
+        "id INTEGER PRIMARY KEY, created_at INTEGER NOT NULL, lang_id INTEGER, district_id INTEGER, "
+        "category_id INTEGER, pattern_id INTEGER, input BLOB, translated BLOB, converted BLOB)",
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_messages_created_at ON messages (created_at)",
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_messages_district "
+        "ON messages (district_id, category_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_messages_district_time ON messages (district_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_messages_category ON messages (category_id, created_at)",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.messages_fts USING fts5("
+        "input, translated, converted, content='', tokenize='unicode61 remove_diacritics 2')",
+    ]
+
+    def __init__(self, db_name='messages.db', write_behind=False, parent=None, background_setup=False):
+        # parent: another DatabaseManager on the same file whose schema,
+        # template cache and write queue this one shares. Used to give each
+        # worker thread its own connection (see AsyncDatabase).
+        # background_setup: create/migrate the schema on a separate thread so
+        # the caller isn't held up; queued writes and worker connections wait
+        # for it, other methods must not be used before wait_ready().
+        if parent is not None:
+            parent.wait_ready()
+            db_name = parent.db_name
+        self.db_name = db_name
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        # Lets freed pages be returned to the filesystem after archiving.
+        # Only takes effect on a new database; older ones are converted by
+        # vacuum(full=True) (manage_db archive).
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.create_function('deflate', 1, deflate, deterministic=True)
+        self.conn.create_function('inflate', 1, inflate, deterministic=True)
+        # Attached archive schema name -> path, least recently used first
+        self._archives = OrderedDict()
+        # WAL keeps readers unblocked while a commit is in progress and
+        # NORMAL sync only fsyncs at checkpoints instead of on every commit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._writer = None
+        if parent is not None:
+            self._templates = parent._templates
+            self._pattern_versions = parent._pattern_versions
+            self.write_errors = parent.write_errors
+            self._write_queue = parent._write_queue
+            self.ready = parent.ready
+            self.setup_error = None
+            return
+        self._templates = TemplateCache()
+        self._pattern_versions = {}
+        self.ready = threading.Event()
+        self.setup_error = None
+
+        # Write-behind mode: writes are queued and a dedicated writer thread
+        # (with its own connection) flushes them in batched transactions.
+        # An in-memory database cannot be shared between connections, so it
+        # always uses direct writes.
+        self.write_errors = []
+        self._write_queue = None
+        if write_behind and db_name != ':memory:':
+            self._write_queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+            self._writer.start()
+
+        if background_setup:
+            threading.Thread(target=self._setup, name='db-setup', daemon=True).start()
+        else:
+            self._setup()
+            self.wait_ready()
+
+    def _setup(self):
+        try:
+            self.create_tables()
+        except Exception as e:
+            self.setup_error = e
+        finally:
+            self.ready.set()
+
+    def wait_ready(self):
+        # Block until the schema is set up; re-raises a setup failure
+        self.ready.wait()
+        if self.setup_error is not None:
+            raise self.setup_error
+
+    def _write(self, statements):
+        # statements: list of (sql, params) committed atomically as one unit
+        if self._write_queue is not None:
+            self._write_queue.put(statements)
+            return
+        with self.conn:
+            for sql, params in statements:
+                self.conn.execute(sql, params)
+
+    def _writer_loop(self):
+        # Queued writes need the schema; a setup failure shows up in
+        # write_errors (raised by flush()) through the writes themselves
+        self.ready.wait()
+        conn = sqlite3.connect(self.db_name)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        while True:
+            unit = self._write_queue.get()
+            if unit is None:
+                self._write_queue.task_done()
+                break
+            # Drain whatever else is already waiting into the same transaction
+            units = [unit]
+            stop = False
+            while len(units) < self.WRITE_BATCH_SIZE:
+                try:
+                    unit = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if unit is None:
+                    stop = True
+                    break
+                units.append(unit)
+            try:
+                with profiler.stage('db.write_batch'):
+                    self._commit_units(conn, units)
+            except sqlite3.Error:
+                # Retry unit by unit so one bad write doesn't drop the batch
+                for statements in units:
+                    try:
+                        self._commit_units(conn, [statements])
+                    except sqlite3.Error as e:
+                        self.write_errors.append(e)
+            for _ in units:
+                self._write_queue.task_done()
+            if stop:
+                self._write_queue.task_done()
+                break
+        conn.close()
+
+    def _commit_units(self, conn, units):
+        # Commit write units in one transaction. A busy database is waited
+        # out (see BUSY_WAIT) rather than the writes being dropped.
+        deadline = time.monotonic() + self.BUSY_WAIT
+        while True:
+            try:
+                with conn:
+                    for statements in units:
+                        for sql, params in statements:
+                            conn.execute(sql, params)
+                return
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not self._busy(e) or time.monotonic() > deadline:
+                    raise
+            time.sleep(self.BUSY_RETRY_DELAY)
+
+    @staticmethod
+    def _busy(error):
+        # SQLITE_BUSY (5, or an extended code based on it); sqlite_errorcode
+        # is missing before Python 3.11
+        code = getattr(error, 'sqlite_errorcode', None)
+        if code is not None:
+            return code & 0xff == 5
+        return 'database is locked' in str(error)
+
+    def flush(self):
+        # Durability point: block until every queued write has been committed.
+        # Raises if any queued write failed since the last flush (each
+        # failure is reported once, by whichever flush sees it first).
+        if self._write_queue is not None:
+            self._write_queue.join()
+        errors = []
+        while True:
+            try:
+                errors.append(self.write_errors.pop(0))
+            except IndexError:
+                break
+        if len(errors) == 1:
+            raise errors[0]
+        if errors:
+            raise sqlite3.DatabaseError(f"{len(errors)} queued writes failed, the first with: {errors[0]}")
+
+    def create_tables(self):
+        cursor = self.conn.cursor()
+        # The original per-stage tables; migration 6 moves their rows into
+        # `messages` and replaces them with views of the same name
+        # Input messages database: id, message, lang, district, category, timestamp
+        cursor.execute('''CREATE TABLE IF NOT EXISTS input_messages (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            message TEXT,
+                            lang TEXT,
+                            district TEXT,
+                            category TEXT,
+                            timestamp TEXT)''')
+        # Translated messages database: id, message, district, category, timestamp
+        cursor.execute('''CREATE TABLE IF NOT EXISTS translated_messages (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            message TEXT,
+                            district TEXT,
+                            category TEXT,
+                            timestamp TEXT)''')
+        # Pattern database: id, pattern_name, pattern_text
+        cursor.execute('''CREATE TABLE IF NOT EXISTS patterns (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            pattern_name TEXT UNIQUE,
+                            pattern_text TEXT)''')
+        # Converted messages database: id, message, district, category, timestamp
+        cursor.execute('''CREATE TABLE IF NOT EXISTS converted_messages (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            message TEXT,
+                            district TEXT,
+                            category TEXT,
+                            timestamp TEXT)''')
+        self.conn.commit()
+        # Insert default example pattern if not exists
+        cursor.execute("SELECT COUNT(*) FROM patterns WHERE pattern_name = ?", ("Default Pattern",))
+        if cursor.fetchone()[0] == 0:
+            default_pattern = (
+                "🛑 *{activity} By {activist}*:-\n"
+                "▪️ *Agenda:* {agenda}\n"
+                "▪️ *Venue* : {venue}\n"
+                "▪️ *Time* : {time}\n"
+                "▪️ *Str* : {strength}"
+            )
+            cursor.execute("INSERT INTO patterns (pattern_name, pattern_text) VALUES (?, ?)",
+                           ("Default Pattern", default_pattern))
+            self.conn.commit()
+        version = self.migrate()
+        if version < self.FINGERPRINT_MIGRATION <= len(self.MIGRATIONS):
+            self._fingerprint_all()
+        if version < self.ID_SEQUENCE_MIGRATION <= len(self.MIGRATIONS):
+            self._reserve_archived_ids()
+        # Finish a bulk import that was interrupted with its indexes dropped
+        row = None
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'deferred_import'").fetchone():
+            row = cursor.execute("SELECT first_id FROM deferred_import").fetchone()
+        if row is not None:
+            self._restore_deferred(row[0])
+
+    # ALTER TABLE has no IF NOT EXISTS; migrate() skips adding a column that
+    # is already there
+    ADD_COLUMN_RE = re.compile(r'ALTER TABLE (\w+) ADD COLUMN (\w+)')
+
+    def migrate(self):
+        cursor = self.conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        # Each step and its version bump are committed together, in an
+        # explicit transaction: in its default mode sqlite3 autocommits DDL
+        # run before a step's first DML, which left a step that was
+        # interrupted half-applied. Every CREATE is IF NOT EXISTS, so
+        # databases left like that by older versions migrate too.
+        isolation_level = self.conn.isolation_level
+        self.conn.isolation_level = None
+        try:
+            for step, statements in enumerate(self.MIGRATIONS[version:], start=version + 1):
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    for sql in statements:
+                        added = self.ADD_COLUMN_RE.match(sql)
+                        if added and added.group(2) in [
+                                row[1] for row in cursor.execute(f"PRAGMA table_info({added.group(1)})")]:
+                            continue
+                        cursor.execute(sql)
+                    cursor.execute(f"PRAGMA user_version = {step}")
+                except BaseException:
+                    cursor.execute("ROLLBACK")
+                    raise
+                cursor.execute("COMMIT")
+        finally:
+            self.conn.isolation_level = isolation_level
+        # The version the database was at before
+        return version
+
+    INSERT_MESSAGE = '''INSERT INTO messages (created_at, lang_id, district_id, category_id, pattern_id,
+                                              pattern_version, input, translated, converted)
+                        VALUES (?1, (SELECT id FROM languages WHERE name = ?2),
+                                (SELECT id FROM districts WHERE name = ?3),
+                                (SELECT id FROM categories WHERE name = ?4),
+                                (SELECT id FROM patterns WHERE pattern_name = ?5),
+                                (SELECT version FROM patterns WHERE pattern_name = ?5), ?6, ?7, ?8)'''
+
+    def _message_insert(self, lang, district, category, input_message=None, translated=None, converted=None,
+                        pattern_name=None):
+        # Lookup rows are created on first use, then the message row refers
+        # to them by id
+        statements = [(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+                      for table, name in (('languages', lang), ('districts', district), ('categories', category))
+                      if name is not None]
+        statements.append((self.INSERT_MESSAGE, (int(time.time()), lang, district, category, pattern_name,
+                                                 input_message, translated, converted)))
+        return statements + self._fingerprint_insert(input_message)
+
+    def _fingerprint_insert(self, input_message):
+        # Statements fingerprinting the message row inserted just before
+        # them. Fingerprints are the only rowless inserts, so
+        # last_insert_rowid() stays the message's id throughout; nothing is
+        # added if that insert added no row.
+        keys = band_keys(input_message) if input_message is not None else ()
+        if not keys:
+            return []
+        return [("INSERT OR IGNORE INTO message_fingerprints (band_key, message_id) "
+                 "SELECT column1, last_insert_rowid() FROM (VALUES "
+                 + ", ".join(["(?)"] * len(keys)) + ") WHERE changes() = 1", keys)]
+
+    INSERT_FINGERPRINT = "INSERT OR IGNORE INTO message_fingerprints (band_key, message_id) VALUES (?, ?)"
+
+    def _index_fingerprints(self, rows):
+        # Fingerprint (id, input message) rows; runs in the caller's transaction
+        self.conn.executemany(self.INSERT_FINGERPRINT,
+                              ((key, message_id) for message_id, message in rows if message is not None
+                               for key in band_keys(message)))
+
+    def save_input_message(self, message, lang, district, category):
+        self._write(self._message_insert(lang, district, category, input_message=message))
+
+    def save_translated_message(self, message, district, category):
+        self._write(self._message_insert(None, district, category, translated=message))
+
+    def save_converted_message(self, message, district, category):
+        self._write(self._message_insert(None, district, category, converted=message))
+
+    def save_conversion(self, input_message, lang, translated, converted, district, category, pattern_name=None):
+        # Input, translation and converted text of one conversion share a
+        # single row, committed atomically
+        self._write(self._message_insert(lang, district, category, input_message, translated, converted,
+                                         pattern_name))
+
+    def save_duplicate(self, input_message, lang, duplicate_of, district=None, category=None):
+        # A near-duplicate input (see find_duplicate) saved as its own message
+        # that shares the translation, conversion and pattern of message
+        # duplicate_of and links to it. District and category default to
+        # that message's.
+        statements = [(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+                      for table, name in (('languages', lang), ('districts', district), ('categories', category))
+                      if name is not None]
+        statements.append((
+            "INSERT INTO messages (created_at, lang_id, district_id, category_id, pattern_id, pattern_version, "
+            "input, translated, converted, duplicate_of) "
+            "SELECT ?, (SELECT id FROM languages WHERE name = ?), "
+            "coalesce((SELECT id FROM districts WHERE name = ?), district_id), "
+            "coalesce((SELECT id FROM categories WHERE name = ?), category_id), "
+            "pattern_id, pattern_version, ?, translated, converted, id FROM messages WHERE id = ?",
+            (int(time.time()), lang, district, category, input_message, duplicate_of)))
+        self._write(statements + self._fingerprint_insert(input_message))
+
+    def save_draft(self, session_id, message, lang, district, category):
+        # Upsert the session's single draft row; the content hash makes
+        # re-saving unchanged text a no-op for the database
+        content_hash = draft_hash(message, lang, district, category)
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._write([(
+            '''INSERT INTO drafts (session_id, message, lang, district, category, content_hash, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (session_id) DO UPDATE SET
+                   message = excluded.message, lang = excluded.lang, district = excluded.district,
+                   category = excluded.category, content_hash = excluded.content_hash,
+                   updated_at = excluded.updated_at
+               WHERE drafts.content_hash != excluded.content_hash''',
+            (session_id, message, lang, district, category, content_hash, timestamp))])
+        return content_hash
+
+    def latest_draft(self):
+        # (session_id, message, lang, district, category) of the most
+        # recently edited draft, or None
+        self.flush()
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT session_id, message, lang, district, category FROM drafts "
+                       "ORDER BY updated_at DESC LIMIT 1")
+        return cursor.fetchone()
+
+    def delete_draft(self, session_id):
+        self._write([("DELETE FROM drafts WHERE session_id = ?", (session_id,))])
+
+    def save_conversions(self, conversions, pattern_name=None):
+        # Bulk version of save_conversion for batch imports: conversions is a
+        # list of (input_message, lang, translated, converted, district,
+        # category) tuples, inserted with executemany in one transaction
+        created_at = int(time.time())
+        self.flush()
+        with self.conn:
+            for table, column in (('languages', 1), ('districts', 4), ('categories', 5)):
+                self.conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)",
+                                      {(c[column],) for c in conversions if c[column] is not None})
+            first_id = self.conn.execute("SELECT coalesce(MAX(id), 0) FROM messages").fetchone()[0]
+            self.conn.executemany(
+                self.INSERT_MESSAGE,
+                [(created_at, c[1], c[4], c[5], pattern_name, c[0], c[2], c[3]) for c in conversions])
+            self._index_fingerprints(self.conn.execute(
+                "SELECT id, input FROM messages WHERE id > ? ORDER BY id", (first_id,)))
+
+    def get_patterns(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT pattern_name FROM patterns ORDER BY pattern_name ASC")
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_pattern_text(self, pattern_name):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT pattern_text FROM patterns WHERE pattern_name = ?", (pattern_name,))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        return ""
+
+    def get_pattern_template(self, pattern_name):
+        # Compiled pattern, cached by (name, version) so repeated conversions
+        # don't re-read and re-parse it
+        version = self._pattern_versions.get(pattern_name)
+        if version is not None:
+            template = self._templates.get((pattern_name, version))
+            if template is not None:
+                return template
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT pattern_text, version FROM patterns WHERE pattern_name = ?", (pattern_name,))
+        result = cursor.fetchone()
+        if not result:
+            return PatternTemplate("")
+        pattern_text, version = result
+        template = PatternTemplate(pattern_text)
+        self._pattern_versions[pattern_name] = version
+        self._templates.put((pattern_name, version), template)
+        return template
+
+    def _invalidate_pattern(self, pattern_name):
+        self._pattern_versions.pop(pattern_name, None)
+        self._templates.invalidate(pattern_name)
+
+    def save_pattern(self, pattern_name, pattern_text):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("INSERT INTO patterns (pattern_name, pattern_text) VALUES (?, ?)", (pattern_name, pattern_text))
+            self.conn.commit()
+            self._invalidate_pattern(pattern_name)
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def update_pattern(self, pattern_name, pattern_text):
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE patterns SET pattern_text = ?, version = version + 1 WHERE pattern_name = ?",
+                       (pattern_text, pattern_name))
+        self.conn.commit()
+        self._invalidate_pattern(pattern_name)
+
+    def _stage_column(self, table_name):
+        if table_name not in self.STAGE_COLUMNS:
+            raise ValueError(f"unknown message table: {table_name}")
+        return self.STAGE_COLUMNS[table_name]
+
+    def _filter_clause(self, date=None, district=None, category=None):
+        # Conditions on `messages m`
+        clause = "WHERE 1=1"
+        params = []
+        if date:
+            # Half-open range [date, date + 1 day) so the created_at indexes apply
+            clause += " AND m.created_at >= ? AND m.created_at < ?"
+            params.extend(self._date_range(date))
+        if district:
+            clause += " AND m.district_id = (SELECT id FROM districts WHERE name = ?)"
+            params.append(district)
+        if category:
+            clause += " AND m.category_id = (SELECT id FROM categories WHERE name = ?)"
+            params.append(category)
+        return clause, params
+
+    def _source_groups(self, date=None):
+        # What a query has to read, as (months, (start, end)) groups, newest
+        # first. A dated query reads the main database and the archive of the
+        # date's month. An undated one reads every archive, at most
+        # MAX_ATTACHED_ARCHIVES months at a time, each group together with
+        # the main rows from the same stretch of time ([start, end) in epoch
+        # seconds, None when open-ended), so reading the groups one after
+        # another gives rows in time order.
+        if date:
+            return [([date[:7]], (None, None))]
+        months = self.archive_months()[::-1]
+        size = self.MAX_ATTACHED_ARCHIVES
+        groups = [months[i:i + size] for i in range(0, len(months), size)] or [[]]
+        # Each group starts at its oldest month and ends where the newer
+        # group starts
+        starts = [int(datetime.strptime(group[-1], '%Y-%m').timestamp()) for group in groups[:-1]] + [None]
+        return list(zip(groups, zip(starts, [None] + starts[:-1])))
+
+    def _sources(self, months):
+        # Schemas to read for a group of archive months: the main database
+        # plus those archives that exist, attached
+        sources = ['main']
+        for month in months:
+            archive = self._archive(month)
+            if archive is not None:
+                sources.append(archive)
+        return sources
+
+    def _message_selects(self, column, date=None, district=None, category=None, after=None, limit=None):
+        # (select, params) per source group, newest first, for groups that
+        # can hold rows before `after`
+        for months, (start, end) in self._source_groups(date):
+            if after is not None and start is not None and start > self._epoch(after[0]):
+                continue
+            yield self._select_messages(column, self._sources(months), date, district, category, after,
+                                        start, end, limit)
+
+    def _select_messages(self, column, sources, date=None, district=None, category=None, after=None,
+                         start=None, end=None, limit=None):
+        # Matching (id, message, created_at) rows of every source, as one
+        # UNION ALL query. With a limit, each of several sources contributes
+        # only its newest `limit` rows, read in index order, so a page
+        # doesn't sort (and decompress) whole archives.
+        clause, params = self._filter_clause(date, district, category)
+        if start is not None:
+            clause += " AND m.created_at >= ?"
+            params.append(start)
+        if end is not None:
+            clause += " AND m.created_at < ?"
+            params.append(end)
+        if after is not None:
+            clause += " AND (m.created_at, m.id) < (?, ?)"
+            params.extend((self._epoch(after[0]), after[1]))
+        selects = []
+        for schema in sources:
+            text = f"m.{column}" if schema == 'main' else f"inflate(m.{column})"
+            select = (f"SELECT m.id AS id, {text} AS message, m.created_at AS created_at, "
+                      f"m.lang_id AS lang_id, m.district_id AS district_id, m.category_id AS category_id "
+                      f"FROM {schema}.messages m {clause} AND m.{column} IS NOT NULL")
+            if limit is not None and len(sources) > 1:
+                select = f"SELECT * FROM ({select} ORDER BY m.created_at DESC, m.id DESC LIMIT {int(limit)})"
+            selects.append(select)
+        return " UNION ALL ".join(selects), params * len(sources)
+
+    def query_messages(self, table_name, date=None, district=None, category=None):
+        # Make sure queued writes are visible to this read
+        self.flush()
+        column = self._stage_column(table_name)
+        cursor = self.conn.cursor()
+        rows = []
+        for select, params in self._message_selects(column, date, district, category):
+            cursor.execute(f"SELECT m.message, {self.TIMESTAMP_SQL} FROM ({select}) m ORDER BY m.created_at DESC",
+                           params)
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def query_messages_page(self, table_name, date=None, district=None, category=None,
+                            after=None, limit=100):
+        # Keyset pagination, newest first. Rows are (id, message, timestamp);
+        # pass the (timestamp, id) of the last row of a page as `after` to get
+        # the next one. Cost per page does not depend on how deep it is.
+        self.flush()
+        column = self._stage_column(table_name)
+        cursor = self.conn.cursor()
+        rows = []
+        for select, params in self._message_selects(column, date, district, category, after, limit - len(rows)):
+            cursor.execute(f"SELECT m.id, m.message, {self.TIMESTAMP_SQL} FROM ({select}) m "
+                           f"ORDER BY m.created_at DESC, m.id DESC LIMIT ?", params + [limit - len(rows)])
+            rows.extend(cursor.fetchall())
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def export_messages(self, table_name, date=None, district=None, category=None, after=None, chunk_size=1000):
+        # Stream every matching row, newest first, as (id, timestamp, lang,
+        # district, category, message). One cursor is read chunk_size rows at
+        # a time, so memory use doesn't grow with the result; `after` takes
+        # the (timestamp, id) of the last row of an interrupted export.
+        self.flush()
+        column = self._stage_column(table_name)
+        for select, params in self._message_selects(column, date, district, category, after):
+            cursor = self.conn.cursor()
+            cursor.execute(
+                f"SELECT m.id, {self.TIMESTAMP_SQL}, l.name, d.name, c.name, m.message FROM ({select}) m "
+                f"LEFT JOIN languages l ON l.id = m.lang_id LEFT JOIN districts d ON d.id = m.district_id "
+                f"LEFT JOIN categories c ON c.id = m.category_id ORDER BY m.created_at DESC, m.id DESC", params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+
+    def import_messages(self, rows, table_name='converted_messages', batch_size=50000, progress=None):
+        # Bulk load of (created_at, lang, district, category, message) rows
+        # into one stage column. Names are mapped to lookup ids in memory and
+        # rows inserted with executemany, batch_size per transaction, while
+        # the secondary indexes and the FTS/daily_counts insert triggers are
+        # dropped; those are rebuilt and caught up in bulk at the end.
+        # progress(count) is called after every batch. Returns the row count.
+        column = self._stage_column(table_name)
+        self.flush()
+        ids = {table: dict(self.conn.execute(f"SELECT name, id FROM {table}"))
+               for table in ('languages', 'districts', 'categories')}
+
+        def lookup(table, name):
+            if name is None:
+                return None
+            if name not in ids[table]:
+                ids[table][name] = self.conn.execute(f"INSERT INTO {table} (name) VALUES (?)", (name,)).lastrowid
+            return ids[table][name]
+
+        insert = (f"INSERT INTO messages (created_at, lang_id, district_id, category_id, {column}) "
+                  f"VALUES (?, ?, ?, ?, ?)")
+        # (The object name is the sixth word of each CREATE statement)
+        with self.conn:
+            first_id = self.conn.execute("SELECT coalesce(MAX(id), 0) FROM messages").fetchone()[0]
+            self.conn.execute("INSERT INTO deferred_import (first_id) VALUES (?)", (first_id,))
+            for sql in self.MESSAGE_INDEXES:
+                self.conn.execute(f"DROP INDEX IF EXISTS {sql.split()[5]}")
+            for sql in self.MESSAGE_INSERT_TRIGGERS:
+                self.conn.execute(f"DROP TRIGGER IF EXISTS {sql.split()[5]}")
+        count = 0
+        batch = []
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    count += self._insert_batch(insert, batch, lookup)
+                    batch = []
+                    if progress is not None:
+                        progress(count)
+            if batch:
+                count += self._insert_batch(insert, batch, lookup)
+                if progress is not None:
+                    progress(count)
+        finally:
+            self._restore_deferred(first_id)
+        return count
+
+    def _insert_batch(self, insert, batch, lookup):
+        with self.conn:
+            self.conn.executemany(insert, [
+                (created_at, lookup('languages', lang), lookup('districts', district),
+                 lookup('categories', category), message)
+                for created_at, lang, district, category, message in batch])
+        return len(batch)
+
+    def _restore_deferred(self, first_id):
+        # Recreate what import_messages() dropped and index/count the rows
+        # added since first_id, in one transaction
+        with self.conn:
+            for sql in self.MESSAGE_INDEXES:
+                self.conn.execute(sql)
+            self.conn.execute(
+                "INSERT INTO messages_fts (rowid, input, translated, converted) "
+                "SELECT id, input, translated, converted FROM messages WHERE id > ?", (first_id,))
+            self.conn.execute(
+                "INSERT INTO daily_counts (day, district_id, category_id, count) "
+                "SELECT date(created_at, 'unixepoch', 'localtime'), coalesce(district_id, 0), "
+                "coalesce(category_id, 0), COUNT(*) FROM messages WHERE id > ? AND converted IS NOT NULL "
+                "GROUP BY 1, 2, 3 ON CONFLICT (day, district_id, category_id) "
+                "DO UPDATE SET count = count + excluded.count", (first_id,))
+            self._index_fingerprints(self.conn.execute(
+                "SELECT id, input FROM messages WHERE id > ? AND input IS NOT NULL", (first_id,)))
+            for sql in self.MESSAGE_INSERT_TRIGGERS:
+                self.conn.execute(sql)
+            self.conn.execute("DELETE FROM deferred_import")
+
+    def iter_messages(self, table_name, date=None, district=None, category=None, page_size=500):
+        # Stream every matching row page by page without holding them all
+        after = None
+        while True:
+            rows = self.query_messages_page(table_name, date, district, category,
+                                            after=after, limit=page_size)
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][2], rows[-1][0])
+
+    def search_messages(self, query, filters=None, limit=50, highlight=('[', ']')):
+        # Full-text search across the message tables, best matches first.
+        # filters may hold date/district/category like query_messages, plus
+        # 'tables' to restrict which message tables are searched.
+        # Returns (table_name, id, snippet, timestamp) rows.
+        filters = dict(filters or {})
+        tables = filters.pop('tables', None) or self.MESSAGE_TABLES
+        if not query.split():
+            return []
+        self.flush()
+        cursor = self.conn.cursor()
+        clause, params = self._filter_clause(**filters)
+        results = []
+        # Every archive when there is no date; each is searched on its own
+        date = filters.get('date')
+        months = [date[:7]] if date else self.archive_months()
+        for table_name in tables:
+            column = self._stage_column(table_name)
+            cursor.execute(
+                f"SELECT m.id, snippet(messages_fts, {self.FTS_COLUMNS.index(column)}, ?, ?, '…', 12), "
+                f"{self.TIMESTAMP_SQL}, messages_fts.rank "
+                f"FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                f"{clause} AND messages_fts MATCH ? ORDER BY messages_fts.rank LIMIT ?",
+                [highlight[0], highlight[1]] + params + [self._fts_query(query, column), limit])
+            results.extend((table_name,) + row for row in cursor.fetchall())
+            for month in months:
+                schema = self._archive(month)
+                if schema is None:
+                    continue
+                # The archive index keeps no text, so snippets are cut from
+                # the decompressed message here
+                cursor.execute(
+                    f"SELECT m.id, inflate(m.{column}), {self.TIMESTAMP_SQL}, f.rank "
+                    f"FROM {schema}.messages_fts f JOIN {schema}.messages m ON m.id = f.rowid "
+                    f"{clause} AND f.messages_fts MATCH ? ORDER BY f.rank LIMIT ?",
+                    params + [self._fts_query(query, column), limit])
+                results.extend((table_name, id_, self._snippet(text, query, highlight), timestamp, rank)
+                               for id_, text, timestamp, rank in cursor.fetchall())
+        # rank is bm25(), lower is better
+        results.sort(key=lambda row: row[4])
+        return [row[:4] for row in results[:limit]]
+
+    # Columns of messages_fts, in order (snippet() takes the index)
+    FTS_COLUMNS = ('input', 'translated', 'converted')
+    # created_at rendered like the legacy '%Y-%m-%d %H:%M:%S' timestamps
+    TIMESTAMP_SQL = "datetime(m.created_at, 'unixepoch', 'localtime')"
+
+    @staticmethod
+    def _fts_query(text, column):
+        # Treat user input as plain terms: quote each one (so FTS syntax
+        # characters are literal) and prefix-match it within one column.
+        # All terms must match.
+        return " ".join(f'{column} : "' + term.replace('"', '""') + '"*' for term in text.split())
+
+    @staticmethod
+    def _snippet(text, query, highlight, size=12):
+        # Approximates snippet(): up to `size` words around the first word
+        # matching a query term (as a prefix), matching words highlighted
+        terms = [term.lower() for term in query.split()]
+        # Words at even indexes, the whitespace between them at odd ones
+        parts = re.split(r'(\s+)', text.strip())
+        hits = {i for i in range(0, len(parts), 2)
+                if any(''.join(ch for ch in parts[i] if ch.isalnum()).lower().startswith(term) for term in terms)}
+        first = min(hits, default=0) // 2
+        start = max(0, min(first - size // 3, (len(parts) + 1) // 2 - size))
+        end = min(len(parts), 2 * (start + size) - 1)
+        out = ''.join(f"{highlight[0]}{parts[i]}{highlight[1]}" if i in hits else parts[i]
+                      for i in range(2 * start, end))
+        return ('…' if start > 0 else '') + out + ('…' if end < len(parts) else '')
+
+    def rebuild_search_index(self):
+        with self.conn:
+            self.conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+    @staticmethod
+    def _date_range(date):
+        # date format yyyy-mm-dd, as a local day in epoch seconds
+        start = datetime.strptime(date, '%Y-%m-%d')
+        return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+
+    @staticmethod
+    def _epoch(timestamp):
+        # '%Y-%m-%d %H:%M:%S' local time, as returned in query rows
+        return int(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp())
+
+    # stats() group_by names -> columns
+    STATS_GROUPS = {'day': 's.day', 'district': 'd.name', 'category': 'c.name'}
+
+    def stats(self, start, end, group_by=('district', 'category'), district=None, category=None):
+        # Number of converted messages from start to end (yyyy-mm-dd, both
+        # inclusive), read from the daily_counts rollup. group_by is any of
+        # 'day', 'district' and 'category'; returns (*group values, count)
+        # rows, or a single (count,) row for an empty group_by.
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+        unknown = set(group_by) - set(self.STATS_GROUPS)
+        if unknown:
+            raise ValueError(f"can't group stats by: {', '.join(sorted(unknown))}")
+        columns = [self.STATS_GROUPS[name] for name in group_by]
+        query = (f"SELECT {', '.join(columns + ['coalesce(SUM(s.count), 0)'])} FROM daily_counts s "
+                 f"LEFT JOIN districts d ON d.id = s.district_id "
+                 f"LEFT JOIN categories c ON c.id = s.category_id "
+                 f"WHERE s.day >= ? AND s.day <= ?")
+        params = [start, end]
+        if district:
+            query += " AND s.district_id = (SELECT id FROM districts WHERE name = ?)"
+            params.append(district)
+        if category:
+            query += " AND s.category_id = (SELECT id FROM categories WHERE name = ?)"
+            params.append(category)
+        if columns:
+            query += f" GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}"
+        self.flush()
+        return self.conn.execute(query, params).fetchall()
+
+    def rebuild_stats(self):
+        # Recount daily_counts from the stored messages, archives included
+        self.flush()
+        recount = ("INSERT INTO daily_counts (day, district_id, category_id, count) "
+                   "SELECT date(created_at, 'unixepoch', 'localtime'), coalesce(district_id, 0), "
+                   "coalesce(category_id, 0), COUNT(*) FROM {schema}.messages WHERE converted IS NOT NULL "
+                   "GROUP BY 1, 2, 3 ON CONFLICT (day, district_id, category_id) "
+                   "DO UPDATE SET count = count + excluded.count")
+        with self.conn:
+            self.conn.execute("DELETE FROM daily_counts")
+            self.conn.execute(recount.format(schema='main'))
+        for month in self.archive_months():
+            schema = self._archive(month)
+            with self.conn:
+                self.conn.execute(recount.format(schema=schema))
+
+    def find_duplicate(self, message, threshold=None, pattern_name=None):
+        # The most similar earlier conversion of a near-identical input
+        # message (see near_duplicates.py), or None. Only the newest
+        # DUPLICATE_CANDIDATES_PER_BAND messages under each of the message's
+        # band keys are compared, so the cost stays flat as the table grows.
+        # With pattern_name, only conversions made with the current version
+        # of that pattern count. Returns (id, similarity, translated,
+        # converted, pattern name, timestamp).
+        if threshold is None:
+            threshold = self.DUPLICATE_THRESHOLD
+        keys = band_keys(message)
+        if not keys:
+            return None
+        self.flush()
+        candidates = " UNION ".join(
+            ["SELECT message_id FROM (SELECT message_id FROM message_fingerprints WHERE band_key = ? "
+             "ORDER BY message_id DESC LIMIT ?)"] * len(keys))
+        params = [value for key in keys for value in (key, self.DUPLICATE_CANDIDATES_PER_BAND)]
+        clause = ""
+        if pattern_name is not None:
+            clause = " AND p.pattern_name = ? AND m.pattern_version = p.version"
+            params.append(pattern_name)
+        rows = self.conn.execute(
+            f"SELECT m.id, m.input, m.translated, m.converted, p.pattern_name, {self.TIMESTAMP_SQL} "
+            f"FROM messages m LEFT JOIN patterns p ON p.id = m.pattern_id "
+            f"WHERE m.id IN ({candidates}) AND m.converted IS NOT NULL{clause}", params)
+        wanted = shingles(message)
+        best = None
+        for message_id, earlier, translated, converted, pattern_name, timestamp in rows:
+            score = jaccard(wanted, shingles(earlier))
+            # Ties go to the newest
+            if score >= threshold and (best is None or (score, message_id) > (best[1], best[0])):
+                best = (message_id, score, translated, converted, pattern_name, timestamp)
+        return best
+
+    def rebuild_fingerprints(self):
+        # Fingerprint every input message in the main database afresh
+        self.flush()
+        self._fingerprint_all()
+
+    def _fingerprint_all(self):
+        # Without flush(): create_tables() runs this while queued writes
+        # wait for the schema, which would deadlock
+        with self.conn:
+            self.conn.execute("DELETE FROM message_fingerprints")
+            self._index_fingerprints(
+                self.conn.execute("SELECT id, input FROM messages WHERE input IS NOT NULL"))
+
+    def archive_months(self):
+        # yyyy-mm of every archive file on disk, oldest first
+        path = self.archive_path('[0-9][0-9][0-9][0-9]-[0-9][0-9]')
+        if path is None:
+            return []
+        return sorted(name[-len('yyyy-mm.db'):-len('.db')] for name in glob.glob(path))
+
+    def archive_path(self, month):
+        # messages.db -> messages-2025-01.db next to it; None for an
+        # in-memory database, which has no archives
+        if self.db_name == ':memory:':
+            return None
+        return f"{os.path.splitext(self.db_name)[0]}-{month}.db"
+
+    def _archive(self, month, create=False):
+        # Schema name of a month's (yyyy-mm) archive, attaching it on first
+        # use; None if the month has no archive and create is false
+        schema = 'archive_' + month.replace('-', '_')
+        if schema in self._archives:
+            self._archives.move_to_end(schema)
+            return schema
+        path = self.archive_path(month)
+        if path is None or not (create or os.path.exists(path)):
+            return None
+        while len(self._archives) >= self.MAX_ATTACHED_ARCHIVES:
+            self.conn.execute(f"DETACH DATABASE {self._archives.popitem(last=False)[0]}")
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self._archives[schema] = path
+        if create:
+            with self.conn:
+                for sql in self.ARCHIVE_SCHEMA:
+                    self.conn.execute(sql.format(schema=schema))
+        return schema
+
+    def _reserve_archived_ids(self):
+        # Start new message ids above every archived one
+        with self.conn:
+            self.conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'messages', 0 "
+                              "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'messages')")
+        for month in self.archive_months():
+            schema = self._archive(month)
+            with self.conn:
+                self.conn.execute(
+                    f"UPDATE sqlite_sequence SET seq = max(seq, "
+                    f"(SELECT coalesce(MAX(id), 0) FROM {schema}.messages)) WHERE name = 'messages'")
+
+    def archive_messages(self, older_than_days=None):
+        # Move messages older than the cutoff (ARCHIVE_AFTER_DAYS by default)
+        # into their month's archive file, then hand the freed pages back to
+        # the filesystem. Returns the number of messages moved.
+        if self.archive_path('') is None:
+            return 0
+        if older_than_days is None:
+            older_than_days = self.ARCHIVE_AFTER_DAYS
+        cutoff = int(time.time()) - older_than_days * 86400
+        self.flush()
+        months = [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT strftime('%Y-%m', created_at, 'unixepoch', 'localtime') "
+            "FROM messages WHERE created_at < ?", (cutoff,))]
+        moved = 0
+        for month in months:
+            start = datetime.strptime(month, '%Y-%m')
+            end = (start + timedelta(days=32)).replace(day=1)
+            bounds = (int(start.timestamp()), min(cutoff, int(end.timestamp())))
+            schema = self._archive(month, create=True)
+            # Rows already archived (an earlier run interrupted between the
+            # archive commit and the delete) are not copied again. Only rows
+            # whose archived copy is there are deleted, so a row whose id an
+            # archived one already has (ids were reused before migration 10)
+            # stays in the main database rather than being lost.
+            rows = (f"FROM main.messages WHERE created_at >= ? AND created_at < ? "
+                    f"AND id NOT IN (SELECT id FROM {schema}.messages)")
+            archived = (f"SELECT id FROM main.messages WHERE created_at >= ? AND created_at < ? "
+                        f"AND (id, created_at) IN (SELECT id, created_at FROM {schema}.messages)")
+            with self.conn:
+                self.conn.execute(
+                    f"INSERT INTO {schema}.messages_fts (rowid, input, translated, converted) "
+                    f"SELECT id, input, translated, converted {rows}", bounds)
+                moved += self.conn.execute(
+                    f"INSERT INTO {schema}.messages (id, created_at, lang_id, district_id, category_id, "
+                    f"pattern_id, input, translated, converted) "
+                    f"SELECT id, created_at, lang_id, district_id, category_id, pattern_id, "
+                    f"deflate(input), deflate(translated), deflate(converted) {rows}", bounds).rowcount
+                # Duplicates are only looked for among unarchived messages
+                self.conn.execute(f"DELETE FROM message_fingerprints WHERE message_id IN ({archived})", bounds)
+                self.conn.execute(f"DELETE FROM main.messages WHERE id IN ({archived})", bounds)
+        if moved:
+            self.vacuum()
+        return moved
+
+    def vacuum(self, full=False):
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            # executescript steps the pragma to completion; execute() would
+            # free a single page
+            self.conn.executescript("PRAGMA incremental_vacuum;")
+        elif full:
+            # Created before incremental auto-vacuum was enabled: switching
+            # takes one full VACUUM, which rewrites the whole file while
+            # holding the write lock, so the app never asks for it. Until
+            # then freed pages are reused by new rows.
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("VACUUM")
+
+    def close(self):
+        if self._writer is not None:
+            self._write_queue.join()
+            self._write_queue.put(None)
+            self._writer.join()
+            self._writer = None
+            self._write_queue = None
+        self.conn.close()
+
+
+# Runs DatabaseManager work on a small thread pool so SQLite never blocks the
+# UI thread. Every worker thread gets its own connection; results and errors
+# are handed to `dispatch` (on Kivy: Clock.schedule_once) so callbacks run
+# back on the UI thread.
+class AsyncDatabase:
+    def __init__(self, db, workers=2, dispatch=None, on_busy=None):
+        # db: the primary DatabaseManager (owns the schema and write queue)
+        # on_busy(pending): called through dispatch whenever the number of
+        # unfinished jobs changes, e.g. to drive a progress indicator
+        self.db = db
+        self.pending = 0
+        self._dispatch = dispatch or (lambda fn: fn())
+        self._on_busy = on_busy
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._worker_dbs = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db-worker')
+
+    def _worker_db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = DatabaseManager(parent=self.db)
+            with self._lock:
+                self._worker_dbs.append(db)
+        return db
+
+    def run(self, fn, *args, callback=None, error=None):
+        # Run fn(worker_db, *args) on a worker; returns a Future. callback
+        # gets the result and error gets the exception, both via dispatch.
+        self._set_pending(1)
+
+        def job():
+            try:
+                result = fn(self._worker_db(), *args)
+            except Exception as e:
+                self._dispatch(lambda e=e: self._finish(error, e))
+                raise
+            self._dispatch(lambda: self._finish(callback, result))
+            return result
+
+        return self._executor.submit(job)
+
+    def call(self, method_name, *args, callback=None, error=None, **kwargs):
+        # Shortcut for calling one DatabaseManager method, e.g.
+        # call('query_messages_page', 'converted_messages', callback=show)
+        return self.run(lambda db: getattr(db, method_name)(*args, **kwargs), callback=callback, error=error)
+
+    def _finish(self, handler, value):
+        self._set_pending(-1)
+        if handler is not None:
+            handler(value)
+
+    def _set_pending(self, delta):
+        with self._lock:
+            self.pending += delta
+            pending = self.pending
+        if self._on_busy is not None:
+            self._dispatch(lambda: self._on_busy(pending))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for db in self._worker_dbs:
+            db.close()
+        self._worker_dbs = []
@@ -0,0 +1,168 @@
+import re
+from functools import lru_cache
+
+
+# Declarative description of one pattern placeholder and how to find it in a
+# bulletin.
+#   labels:   words that introduce the field on a "Label: value" line, in any
+#             language (matched case-insensitively as whole words)
+#   patterns: (regex, confidence) pairs tried on lines without a label; the
+#             regex's 'value' group (or the whole match) becomes the value
+#   priority: decides between fields whose labels collide, higher wins
+class FieldRule:
+    def __init__(self, name, labels=(), patterns=(), default="", priority=0):
+        self.name = name
+        self.labels = list(labels)
+        self.patterns = [(re.compile(regex, re.IGNORECASE), confidence) for regex, confidence in patterns]
+        self.default = default
+        self.priority = priority
+
+
+# Confidence of a value found on a line with one of the field's labels
+LABEL_CONFIDENCE = 1.0
+# Where a value found inside a sentence ends: before " at " (the venue
+# follows), a comma, colon, '*' or sentence-ending full stop, or trailing
+# punctuation at the end of the line. One-line bulletins read like "Rally by
+# PTI at Press Club, Hyderabad at 5 pm, 300 participants. Agenda: ...".
+_VALUE_END = r"(?=\s+at\s|\s*(?:[*:,]|\.(?:\s|$))|[\W_]*$)"
+
+FIELD_RULES = {
+    rule.name: rule for rule in [
+        FieldRule(
+            "activity",
+            labels=["activity", "event", "program", "programme", "پروگرام", "سرگرمی", "سرگرمي"],
+            patterns=[
+                (r"^[\W_]*(?P<value>[^:,]*?\b(?:rally|rallies|protest|demonstration|meeting|strike|sit-in|dharna"
+                 r"|convention|seminar|conference|procession|ریلی|احتجاج|جلوس|اجلاس|کانفرنس)\b[^:,]*?)"
+                 r"(?=\s+by\s|\s+at\s+\d|\s*(?:[*:,]|\.(?:\s|$))|[\W_]*$)", 0.7),
+            ],
+            default="Activity",
+        ),
+        FieldRule(
+            "activist",
+            labels=["by", "organizer", "organiser", "organized by", "organised by", "led by", "activist",
+                    "زیر اہتمام", "منجانب", "طرفان"],
+            patterns=[
+                (r"\bby\s+(?P<value>[^*:,\n]+?)" + _VALUE_END, 0.6),
+            ],
+            default="Activist",
+        ),
+        FieldRule(
+            "agenda",
+            labels=["agenda", "purpose", "topic", "subject", "demand", "demands", "ایجنڈا", "ايجنڊا", "مقصد", "مطالبہ"],
+            patterns=[
+                # "... 300 participants. Agenda: against price hike"
+                (r"\b(?:agenda|purpose|demands?)\s*[:：]\s*(?P<value>[^\n]+?)[\W_]*$", 0.9),
+            ],
+            default="Agenda not provided",
+        ),
+        FieldRule(
+            "venue",
+            labels=["venue", "place", "location", "address", "مقام", "جگہ", "هنڌ", "جاءِ"],
+            patterns=[
+                # "at Circuit House, Sukkur at 9:30 am": the venue and one
+                # ", place" after it, but not a time or a count
+                (r"(?:\bat|@)\s+(?!\d)(?P<value>[^*:,\n]+?(?:,\s*(?!\d)[^*:,\n]+?)?)" + _VALUE_END, 0.4),
+            ],
+            default="Venue not specified",
+        ),
+        FieldRule(
+            "time",
+            labels=["time", "timing", "timings", "وقت", "ٽائيم", "ٹائم"],
+            patterns=[
+                (r"(?P<value>\b\d{1,2}(?:[:.]\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)|\b\d{4}\s*hrs)(?!\w)", 0.6),
+            ],
+            default="Time not specified",
+        ),
+        FieldRule(
+            "strength",
+            labels=["str", "strength", "participants", "attendance", "تعداد", "شرکاء", "شرڪت ڪندڙ"],
+            patterns=[
+                (r"(?P<value>\d+)\s*\+?\s*(?:participants|people|persons|workers|members|افراد|لوگ|ماڻهو)", 0.6),
+            ],
+            default="0",
+        ),
+    ]
+}
+
+
+def rule_for_placeholder(name):
+    # Placeholders without a predefined rule are filled from a line labelled
+    # with the placeholder's own name, e.g. {organizer} <- "Organizer: X"
+    if name in FIELD_RULES:
+        return FIELD_RULES[name]
+    return FieldRule(name, labels=[name.replace('_', ' ')], default="Not provided")
+
+
+# Compiled extractor for a fixed set of fields. All labels are merged into a
+# single regex with one named group per field, so each line is classified
+# with one match; only lines without a label fall through to the (few)
+# per-field value patterns.
+class FieldExtractor:
+    def __init__(self, rules):
+        self.rules = list(rules)
+        label_owner = {}
+        for index, rule in sorted(enumerate(self.rules), key=lambda item: item[1].priority):
+            for label in rule.labels:
+                label_owner[label.casefold()] = index
+        by_field = {}
+        for label, index in label_owner.items():
+            by_field.setdefault(index, []).append(label)
+        alternatives = []
+        for index, labels in sorted(by_field.items()):
+            # Longest first so 'organized by' wins over 'by'
+            labels = sorted(labels, key=len, reverse=True)
+            alternatives.append(f"(?P<f{index}>" + "|".join(re.escape(label) for label in labels) + ")")
+        self._label_re = None
+        if alternatives:
+            self._label_re = re.compile(
+                r"^[\W_]*(?:" + "|".join(alternatives) + r")(?!\w)[^\w:：]*[:：]",
+                re.IGNORECASE)
+        self._patterns = [(index, regex, confidence)
+                          for index, rule in enumerate(self.rules)
+                          for regex, confidence in rule.patterns]
+
+    def label_field(self, line):
+        # Name of the field a "Label: value" line is labelled with, or None
+        if self._label_re is None:
+            return None
+        match = self._label_re.match(line)
+        return self.rules[int(match.lastgroup[1:])].name if match is not None else None
+
+    def extract(self, text):
+        # Returns (values, confidence): field name -> value, and field name ->
+        # confidence in [0, 1]; 0 means the default value was used. For each
+        # field the most confident value wins, the earliest line on ties.
+        values = {rule.name: rule.default for rule in self.rules}
+        confidence = {rule.name: 0.0 for rule in self.rules}
+        label_re, patterns, rules = self._label_re, self._patterns, self.rules
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            match = label_re.match(line) if label_re is not None else None
+            if match is not None:
+                # The label's group is the last one closed, and the value is
+                # the rest of the line
+                name = rules[int(match.lastgroup[1:])].name
+                value = line[match.end():].strip(' \t*_')
+                if value and confidence[name] < LABEL_CONFIDENCE:
+                    values[name] = value
+                    confidence[name] = LABEL_CONFIDENCE
+                continue
+            for index, regex, score in patterns:
+                name = rules[index].name
+                if confidence[name] >= score:
+                    continue
+                match = regex.search(line)
+                if match is not None:
+                    value = (match.group('value') if 'value' in regex.groupindex else match.group(0)).strip()
+                    if value:
+                        values[name] = value
+                        confidence[name] = score
+        return values, confidence
+
+
+@lru_cache(maxsize=64)
+def extractor_for(fields):
+    # fields: tuple of placeholder names, e.g. PatternTemplate.fields
+    return FieldExtractor(rule_for_placeholder(name) for name in fields)
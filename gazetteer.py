@@ -0,0 +1,116 @@
+import os
+import re
+
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.txt')
+
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _words(text):
+    return _WORD_RE.findall(text.casefold())
+
+
+# Multi-keyword matcher: every alias of every entry is compiled once into a
+# hash table keyed by its (casefolded) words. A text is tokenized into words
+# in one regex pass and each run of up to `longest alias` words is looked up
+# directly, so classification cost depends on the text length, not on how
+# many names are in the dictionary. Matching on words gives whole-word
+# boundaries for free ('Hyd' no longer matches inside 'Hydrant').
+class Gazetteer:
+    def __init__(self, entries):
+        # entries: iterable of (kind, name, aliases). The order of entries is
+        # their priority within a kind: when several match, the first wins.
+        # A single-word alias ending in '*' also matches longer words that
+        # start with it ('protest*' matches 'protesters').
+        self.names = {}
+        self._phrases = {}
+        self._prefixes = {}
+        self._max_words = 1
+        for priority, (kind, name, aliases) in enumerate(entries):
+            self.names.setdefault(kind, []).append(name)
+            for alias in aliases:
+                pattern = (kind, name, priority)
+                words = _words(alias)
+                if not words:
+                    continue
+                if alias.rstrip().endswith('*') and len(words) == 1:
+                    self._prefixes.setdefault(words[0], []).append(pattern)
+                else:
+                    self._phrases.setdefault(' '.join(words), []).append(pattern)
+                    self._max_words = max(self._max_words, len(words))
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes})
+        # First words of multi-word aliases, so longer runs are only built
+        # where one can actually start
+        self._phrase_starts = {phrase.split(' ', 1)[0] for phrase in self._phrases if ' ' in phrase}
+
+    @classmethod
+    def load(cls, path=DEFAULT_GAZETTEER_PATH):
+        # File format: one entry per line, tab separated
+        #   kind <TAB> name <TAB> alias|alias|...
+        # Blank lines and lines starting with '#' are ignored. The name itself
+        # is always an alias.
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = line.split('\t')
+                kind, name = fields[0].strip(), fields[1].strip()
+                aliases = [name]
+                if len(fields) > 2:
+                    aliases.extend(alias.strip() for alias in fields[2].split('|'))
+                entries.append((kind, name, aliases))
+        return cls(entries)
+
+    def matches(self, text):
+        # Yield (kind, name, priority, word_index) for each match
+        words = _words(text)
+        phrases, prefixes = self._phrases, self._prefixes
+        for i, word in enumerate(words):
+            if word in phrases:
+                for pattern in phrases[word]:
+                    yield pattern + (i,)
+            if word in self._phrase_starts:
+                for n in range(2, min(self._max_words, len(words) - i) + 1):
+                    phrase = ' '.join(words[i:i + n])
+                    if phrase in phrases:
+                        for pattern in phrases[phrase]:
+                            yield pattern + (i,)
+            for length in self._prefix_lengths:
+                if length >= len(word):
+                    break
+                if word[:length] in prefixes:
+                    for pattern in prefixes[word[:length]]:
+                        yield pattern + (i,)
+            # A prefix alias also matches the whole word exactly
+            if word in prefixes:
+                for pattern in prefixes[word]:
+                    yield pattern + (i,)
+
+    def classify(self, text):
+        # Best (lowest priority number) matching name for each kind
+        best = {}
+        for kind, name, priority, _ in self.matches(text):
+            if kind not in best or priority < best[kind][0]:
+                best[kind] = (priority, name)
+        return {kind: name for kind, (_, name) in best.items()}
+
+    def canonical(self, kind, text):
+        # The name of `kind` that text is exactly an alias of ('hyderabad',
+        # 'حیدرآباد' -> 'Hyd'), or None
+        patterns = self._phrases.get(' '.join(_words(text)), ())
+        found = [(priority, name) for pattern_kind, name, priority in patterns if pattern_kind == kind]
+        return min(found)[1] if found else None
+
+
+_default_gazetteer = None
+
+
+def default_gazetteer():
+    global _default_gazetteer
+    if _default_gazetteer is None:
+        _default_gazetteer = Gazetteer.load()
+    return _default_gazetteer
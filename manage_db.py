@@ -0,0 +1,175 @@
+# Maintenance commands for the message database, without the GUI.
+#
+#   python manage_db.py stats 2025-06-01 2025-06-07 --group-by district --category B
+#   python manage_db.py rebuild-stats            # recount daily_counts
+#   python manage_db.py rebuild-search-index
+#   python manage_db.py rebuild-fingerprints     # re-index input messages for duplicate checks
+#   python manage_db.py find-duplicate message.txt --threshold 0.8 --pattern "Default Pattern"
+#   python manage_db.py archive --days 90        # move old messages to monthly archives
+#   python manage_db.py export logs.csv --district Hyd --checkpoint logs.ckpt
+#   python manage_db.py import old_logs.jsonl
+#   python manage_db.py --trace import.json import old_logs.jsonl   # stage timings + Chrome trace
+import argparse
+import sys
+
+import message_io
+from database import DatabaseManager
+from profiling import profiler
+
+
+def stats(db, args):
+    group_by = tuple(args.group_by.split(',')) if args.group_by else ()
+    for row in db.stats(args.start, args.end, group_by, district=args.district, category=args.category):
+        print('\t'.join(str(value) for value in row))
+
+
+def rebuild_stats(db, args):
+    db.rebuild_stats()
+
+
+def rebuild_search_index(db, args):
+    db.rebuild_search_index()
+
+
+def rebuild_fingerprints(db, args):
+    db.rebuild_fingerprints()
+
+
+def find_duplicate(db, args):
+    if args.input == '-':
+        message = sys.stdin.read()
+    else:
+        with open(args.input, encoding='utf-8') as f:
+            message = f.read()
+    duplicate = db.find_duplicate(message.strip(), args.threshold, args.pattern)
+    if duplicate is None:
+        print("No near-duplicate found", file=sys.stderr)
+        return
+    message_id, similarity, _, converted, pattern_name, timestamp = duplicate
+    print(f"message {message_id} from {timestamp}, {similarity:.0%} alike, pattern {pattern_name}",
+          file=sys.stderr)
+    print(converted)
+
+
+def archive(db, args):
+    moved = db.archive_messages(args.days)
+    # Databases from before incremental auto-vacuum get their one full
+    # VACUUM here rather than in the app
+    db.vacuum(full=True)
+    print(f"Archived {moved} messages", file=sys.stderr)
+
+
+def _format(path, fmt):
+    if fmt == 'auto':
+        return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    return fmt
+
+
+def export(db, args):
+    fmt = _format(args.output, args.format)
+    if args.output == '-':
+        out = sys.stdout
+    else:
+        out = message_io.open_export(args.output, args.checkpoint)
+    try:
+        count = message_io.export_messages(db, out, fmt, args.table, args.date, args.district, args.category,
+                                           checkpoint=args.checkpoint if out is not sys.stdout else None)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {count} messages", file=sys.stderr)
+
+
+def import_(db, args):
+    fmt = _format(args.input, args.format)
+
+    def report(count, rate):
+        print(f"{count} rows, {rate:.0f} rows/sec", file=sys.stderr)
+
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8', newline='')
+    try:
+        count, rejected, errors, elapsed = message_io.import_messages(
+            db, stream, fmt, args.table, default_lang=args.lang, report=None if args.quiet else report)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    for error in errors:
+        print(error, file=sys.stderr)
+    rate = count / elapsed if elapsed else 0
+    print(f"Imported {count} messages in {elapsed:.1f}s ({rate:.0f} rows/sec), rejected {rejected}",
+          file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Message database maintenance.")
+    parser.add_argument('--db', default='messages.db', help="database file")
+    parser.add_argument('--trace', help="profile the command: print per-stage timings and write a Chrome trace here")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_stats = commands.add_parser('stats', help="converted message counts from the daily rollup")
+    parser_stats.add_argument('start', help="first day, YYYY-MM-DD")
+    parser_stats.add_argument('end', help="last day, YYYY-MM-DD (inclusive)")
+    parser_stats.add_argument('--group-by', default='district,category',
+                              help="comma-separated: day, district, category (empty for a total)")
+    parser_stats.add_argument('--district')
+    parser_stats.add_argument('--category')
+    parser_stats.set_defaults(handler=stats)
+
+    commands.add_parser('rebuild-stats', help="recount the daily rollup from all messages, archives included"
+                        ).set_defaults(handler=rebuild_stats)
+    commands.add_parser('rebuild-search-index', help="rebuild the full-text index of the main database"
+                        ).set_defaults(handler=rebuild_search_index)
+    commands.add_parser('rebuild-fingerprints', help="rebuild the near-duplicate index of input messages"
+                        ).set_defaults(handler=rebuild_fingerprints)
+
+    parser_duplicate = commands.add_parser('find-duplicate',
+                                           help="print the earlier conversion of a near-identical message")
+    parser_duplicate.add_argument('input', help="file holding the message ('-' for stdin)")
+    parser_duplicate.add_argument('--threshold', type=float, default=DatabaseManager.DUPLICATE_THRESHOLD,
+                                  help="minimum similarity, 0 to 1 (default %(default)s)")
+    parser_duplicate.add_argument('--pattern', help="only conversions made with the current version of this pattern")
+    parser_duplicate.set_defaults(handler=find_duplicate)
+
+    parser_archive = commands.add_parser('archive', help="move old messages into monthly archive files")
+    parser_archive.add_argument('--days', type=int, default=DatabaseManager.ARCHIVE_AFTER_DAYS,
+                                help="archive messages older than this many days")
+    parser_archive.set_defaults(handler=archive)
+
+    tables = list(DatabaseManager.MESSAGE_TABLES)
+    parser_export = commands.add_parser('export', help="stream filtered message logs, archives included, to CSV or JSONL")
+    parser_export.add_argument('output', help="output file ('-' for stdout)")
+    parser_export.add_argument('--format', choices=['auto', 'csv', 'jsonl'], default='auto',
+                               help="auto picks jsonl for .jsonl/.ndjson files")
+    parser_export.add_argument('--table', choices=tables, default='converted_messages')
+    parser_export.add_argument('--date', help="YYYY-MM-DD")
+    parser_export.add_argument('--district')
+    parser_export.add_argument('--category')
+    parser_export.add_argument('--checkpoint', help="file recording progress, for resuming an interrupted export")
+    parser_export.set_defaults(handler=export)
+
+    parser_import = commands.add_parser('import', help="bulk-load CSV or JSONL message logs")
+    parser_import.add_argument('input', help="input file ('-' for stdin)")
+    parser_import.add_argument('--format', choices=['auto', 'csv', 'jsonl'], default='auto',
+                               help="auto picks jsonl for .jsonl/.ndjson files")
+    parser_import.add_argument('--table', choices=tables, default='converted_messages',
+                               help="which message text the records hold")
+    parser_import.add_argument('--lang', help="language of records that don't specify one")
+    parser_import.add_argument('--quiet', '-q', action='store_true', help="only report the final rate")
+    parser_import.set_defaults(handler=import_)
+
+    args = parser.parse_args(argv)
+    profiler.enabled = profiler.enabled or bool(args.trace)
+    db = DatabaseManager(args.db)
+    try:
+        args.handler(db, args)
+    finally:
+        db.close()
+        if args.trace:
+            for line in profiler.report():
+                print(line, file=sys.stderr)
+            profiler.export_chrome_trace(args.trace)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,7 @@
+import os
 import sqlite3
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.textinput import TextInput
@@ -8,213 +10,139 @@ from kivy.uix.label import Label
 from kivy.uix.spinner import Spinner
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.popup import Popup
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.core.clipboard import Clipboard
 from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.properties import StringProperty
 
+from database import AsyncDatabase, DatabaseManager, draft_hash
+from gazetteer import default_gazetteer
+from pipeline import convert_batch, convert_message_to_pattern, make_translator
+from profiling import PhaseTimer, profiler
+from splitter import split_bulletins
 
-# Database Helper Class
-class DatabaseManager:
-    def __init__(self, db_name='messages.db'):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.create_tables()
-
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        # Input messages database: id, message, lang, district, category, timestamp
-        cursor.execute('''CREATE TABLE IF NOT EXISTS input_messages (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            message TEXT,
-                            lang TEXT,
-                            district TEXT,
-                            category TEXT,
-                            timestamp TEXT)''')
-        # Translated messages database: id, message, district, category, timestamp
-        cursor.execute('''CREATE TABLE IF NOT EXISTS translated_messages (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            message TEXT,
-                            district TEXT,
-                            category TEXT,
-                            timestamp TEXT)''')
-        # Pattern database: id, pattern_name, pattern_text
-        cursor.execute('''CREATE TABLE IF NOT EXISTS patterns (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            pattern_name TEXT UNIQUE,
-                            pattern_text TEXT)''')
-        # Converted messages database: id, message, district, category, timestamp
-        cursor.execute('''CREATE TABLE IF NOT EXISTS converted_messages (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            message TEXT,
-                            district TEXT,
-                            category TEXT,
-                            timestamp TEXT)''')
-        self.conn.commit()
-        # Insert default example pattern if not exists
-        cursor.execute("SELECT COUNT(*) FROM patterns WHERE pattern_name = ?", ("Default Pattern",))
-        if cursor.fetchone()[0] == 0:
-            default_pattern = (
-                "🛑 *{activity} By {activist}*:-\n"
-                "▪️ *Agenda:* {agenda}\n"
-                "▪️ *Venue* : {venue}\n"
-                "▪️ *Time* : {time}\n"
-                "▪️ *Str* : {strength}"
-            )
-            cursor.execute("INSERT INTO patterns (pattern_name, pattern_text) VALUES (?, ?)",
-                           ("Default Pattern", default_pattern))
-            self.conn.commit()
-
-    def save_input_message(self, message, lang, district, category):
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor = self.conn.cursor()
-        cursor.execute('''INSERT INTO input_messages (message, lang, district, category, timestamp)
-                          VALUES (?, ?, ?, ?, ?)''',
-                       (message, lang, district, category, timestamp))
-        self.conn.commit()
-
-    def save_translated_message(self, message, district, category):
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor = self.conn.cursor()
-        cursor.execute('''INSERT INTO translated_messages (message, district, category, timestamp)
-                          VALUES (?, ?, ?, ?)''',
-                       (message, district, category, timestamp))
-        self.conn.commit()
-
-    def save_converted_message(self, message, district, category):
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor = self.conn.cursor()
-        cursor.execute('''INSERT INTO converted_messages (message, district, category, timestamp)
-                          VALUES (?, ?, ?, ?)''',
-                       (message, district, category, timestamp))
-        self.conn.commit()
-
-    def get_patterns(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT pattern_name FROM patterns ORDER BY pattern_name ASC")
-        return [row[0] for row in cursor.fetchall()]
-
-    def get_pattern_text(self, pattern_name):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT pattern_text FROM patterns WHERE pattern_name = ?", (pattern_name,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        return ""
-
-    def save_pattern(self, pattern_name, pattern_text):
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute("INSERT INTO patterns (pattern_name, pattern_text) VALUES (?, ?)", (pattern_name, pattern_text))
-            self.conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-
-    def update_pattern(self, pattern_name, pattern_text):
-        cursor = self.conn.cursor()
-        cursor.execute("UPDATE patterns SET pattern_text = ? WHERE pattern_name = ?", (pattern_text, pattern_name))
-        self.conn.commit()
-
-    def query_messages(self, table_name, date=None, district=None, category=None):
-        cursor = self.conn.cursor()
-        query = f"SELECT message, timestamp FROM {table_name} WHERE 1=1"
-        params = []
-        if date:
-            # date format yyyy-mm-dd so filter by date prefix in timestamp string
-            query += " AND timestamp LIKE ?"
-            params.append(f"{date}%")
-        if district:
-            query += " AND district = ?"
-            params.append(district)
-        if category:
-            query += " AND category = ?"
-            params.append(category)
-        query += " ORDER BY timestamp DESC"
-        cursor.execute(query, params)
-        return cursor.fetchall()
-
-    def close(self):
-        self.conn.close()
-
-
-# Translation Helper (Dummy - replace with actual translation if needed)
-def translate_to_english(text, lang):
-    # For simplicity, this function returns text as-is for English
-    # For Urdu and Sindhi, you can integrate any offline translation approach here
-    # For now, just return input text
-    if lang.lower() == 'english':
-        return text
-    elif lang.lower() in ('urdu', 'sindhi'):
-        # Here place your translation engine or logic. Dummy returns original text
-        return text
-    else:
-        return text
-
-
-# Parsing Input for Extracting District and Category (Example logic; adjust per your real parsing needs)
-def parse_area_category(text):
-    # Dummy logic: extract district and category from text by keyword matching
-    # A more robust approach may use NLP or regex extraction from text
-    district = "Unknown"
-    category = "Others"
-
-    # Example fake logic: look for district keywords (in a real app, replace with real district names)
-    known_districts = ["Hyd", "Karachi", "Lahore", "Islamabad", "Multan"]
-    for d in known_districts:
-        if d.lower() in text.lower():
-            district = d
-            break
-
-    # Category example rules based on keywords in text (adjust as per real categories)
-    if "labour" in text.lower():
-        category = "A"
-    elif "rally" in text.lower() or "protest" in text.lower():
-        category = "B"
-    elif "meeting" in text.lower():
-        category = "C"
-    else:
-        category = "Others"
-
-    return district, category
-
-
-# Message Conversion Helper: Replace placeholders in pattern by extracting info from input text
-def convert_message_to_pattern(input_text, pattern_text):
-    # Basic extraction logic: identify fields by keywords in input text
-    # A real app would require more advanced parsing or user entry of relevant fields
-
-    # Here, the keys and default values of the example pattern from your description:
-    data = {
-        "activity": "Activity",
-        "activist": "Activist",
-        "agenda": "Agenda not provided",
-        "venue": "Venue not specified",
-        "time": "Time not specified",
-        "strength": "0"
-    }
-
-    lines = input_text.splitlines()
-    for line in lines:
-        l = line.lower()
-        if "labour day rally" in l or "activity" in l:
-            data["activity"] = line.strip()
-        if "by" in l and "*" not in line:
-            data["activist"] = line.strip()
-        if "agenda" in l:
-            data["agenda"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
-        if "venue" in l:
-            data["venue"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
-        if "time" in l:
-            data["time"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
-        if "str" in l or "strength" in l:
-            data["strength"] = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
-
-    # Format pattern by replacing placeholders
-    try:
-        formatted_text = pattern_text.format(**data)
-    except Exception:
-        formatted_text = input_text  # fallback to original input if format fails
-
-    return formatted_text
+
+# One row of the logs list. Text wraps to the row width, so the row's
+# height is only known once it has been rendered: the estimate in the data
+# entry is replaced with the rendered height, which makes the layout move
+# the rows below.
+class LogEntry(RecycleDataViewBehavior, Label):
+    def __init__(self, **kwargs):
+        super().__init__(halign='left', valign='top', font_size=14, **kwargs)
+        self.rv = None
+        self.index = None
+        self.bind(width=lambda instance, width: setattr(self, 'text_size', (width, None)),
+                  texture_size=self._fit_height)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.rv = rv
+        self.index = index
+        return super().refresh_view_attrs(rv, index, data)
+
+    def _fit_height(self, instance, texture_size):
+        if self.rv is None or self.index is None or self.index >= len(self.rv.data):
+            return
+        height = max(texture_size[1], LogsView.LINE_HEIGHT)
+        entry = self.rv.data[self.index]
+        if entry.get('text') == self.text and entry.get('height') != height:
+            # Replacing the entry (not updating it in place) tells the
+            # layout that this row changed size
+            self.rv.data[self.index] = dict(entry, height=height)
+
+
+# Run fn on the Kivy UI thread; used to deliver AsyncDatabase results
+def on_ui_thread(fn):
+    Clock.schedule_once(lambda dt: fn())
+
+
+# Logs list backed by a RecycleView: only the visible rows get widgets, and
+# further pages are fetched (on a database worker) as the user nears the bottom
+class LogsView(RecycleView):
+    PAGE_SIZE = 100
+    LINE_HEIGHT = 20
+
+    def __init__(self, adb, **kwargs):
+        super().__init__(**kwargs)
+        self.adb = adb
+        self.viewclass = LogEntry
+        layout = RecycleBoxLayout(default_size=(None, self.LINE_HEIGHT), default_size_hint=(1, None),
+                                  size_hint_y=None, orientation='vertical', padding=5, spacing=10)
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self.bind(scroll_y=self._on_scroll)
+        self._query = None
+        self._after = None
+        self._exhausted = True
+        self._loading = False
+        # Bumped on every new query so pages of an older one are dropped
+        self._generation = 0
+
+    def load(self, table_name, date=None, district=None, category=None):
+        self._generation += 1
+        self._query = (table_name, date, district, category)
+        self._after = None
+        self._exhausted = False
+        self._loading = False
+        self.data = [self._entry("Loading...")]
+        self.scroll_y = 1
+        self.load_next_page()
+
+    def show_results(self, rows, empty_text):
+        # Show a fixed list of (message, timestamp) rows, e.g. search results
+        self._generation += 1
+        self._query = None
+        self._exhausted = True
+        self.data = [self._entry(msg, timestamp) for msg, timestamp in rows] or [self._entry(empty_text)]
+        self.scroll_y = 1
+
+    def _entry(self, msg, timestamp=None):
+        # The height is an estimate until the row is rendered (see LogEntry)
+        text = f"[{timestamp}] {msg}" if timestamp else msg
+        return {'text': text, 'height': (msg.count('\n') + 1) * self.LINE_HEIGHT}
+
+    def load_next_page(self):
+        if self._exhausted or self._loading:
+            return
+        self._loading = True
+        generation = self._generation
+        table_name, date, district, category = self._query
+        self.adb.call('query_messages_page', table_name, date, district, category,
+                      after=self._after, limit=self.PAGE_SIZE,
+                      callback=lambda rows: self._add_page(generation, rows),
+                      error=lambda error: self._page_failed(generation, error))
+
+    @profiler.timed('ui.logs_page')
+    def _add_page(self, generation, rows):
+        if generation != self._generation:
+            return
+        first_page = self._after is None
+        self._loading = False
+        if len(rows) < self.PAGE_SIZE:
+            self._exhausted = True
+        entries = [self._entry(msg, timestamp) for _, msg, timestamp in rows]
+        if rows:
+            self._after = (rows[-1][2], rows[-1][0])
+        if first_page:
+            self.data = entries or [self._entry("No messages found for the given filter.")]
+        else:
+            self.data.extend(entries)
+
+    def _page_failed(self, generation, error):
+        # Scrolling to the bottom again retries the page
+        if generation != self._generation:
+            return
+        self._loading = False
+        Logger.warning(f"Logs: could not load a page: {error}")
+        if self._after is None:
+            self.data = [self._entry(f"Could not load messages: {error}")]
+
+    def _on_scroll(self, instance, scroll_y):
+        # scroll_y goes from 1 (top) to 0 (bottom)
+        if scroll_y < 0.1:
+            self.load_next_page()
 
 
 class MessageAppGUI(BoxLayout):
@@ -222,9 +150,21 @@ class MessageAppGUI(BoxLayout):
     filter_district = StringProperty("")
     filter_category = StringProperty("")
 
-    def __init__(self, **kwargs):
+    DRAFT_SAVE_DELAY = 2
+    # How long a notification stays in the status area
+    TOAST_SECONDS = 3
+
+    def __init__(self, startup=None, **kwargs):
         super().__init__(orientation='vertical', **kwargs)
-        self.db = DatabaseManager()
+        # Cold start is kept short: the schema is set up on a background
+        # thread, the pattern list arrives once it is ready, and the logs
+        # panel and popups are only built when first used
+        self.startup = startup or PhaseTimer('startup')
+        self.db = DatabaseManager(write_behind=True, background_setup=True)
+        # All database work triggered from the UI goes through this facade
+        self.adb = AsyncDatabase(self.db, dispatch=on_ui_thread, on_busy=self._show_busy)
+        self.translator = make_translator(self.db.db_name)
+        self.startup.mark('database opened')
 
         # Top: Language, District, Category selectors
         top_layout = BoxLayout(size_hint_y=None, height=40, spacing=5)
@@ -239,7 +179,7 @@ class MessageAppGUI(BoxLayout):
 
         self.district_spinner = Spinner(
             text='Select District',
-            values=['Unknown', 'Hyd', 'Karachi', 'Lahore', 'Islamabad', 'Multan'],
+            values=['Unknown'] + default_gazetteer().names['district'],
             size_hint=(0.3, None),
             height=30
         )
@@ -268,7 +208,7 @@ class MessageAppGUI(BoxLayout):
         pattern_layout = BoxLayout(size_hint_y=None, height=40, spacing=5)
         self.pattern_spinner = Spinner(
             text='Default Pattern',
-            values=self.db.get_patterns(),
+            values=[],
             size_hint=(0.6, None),
             height=30
         )
@@ -303,16 +243,51 @@ class MessageAppGUI(BoxLayout):
         copy_btn.bind(on_release=self.copy_output_text)
         btn_layout.add_widget(copy_btn)
 
+        # Progress indicator for background database work, also showing
+        # short notifications (see notify)
+        self.busy_label = Label(text='', size_hint_x=0.5)
+        btn_layout.add_widget(self.busy_label)
+        self._busy = False
+        self._toast = ''
+        self._toast_trigger = Clock.create_trigger(self._clear_toast, self.TOAST_SECONDS)
+
         clear_btn = Button(text='Clear')
         clear_btn.bind(on_release=self.clear_input_output)
         btn_layout.add_widget(clear_btn)
 
+        perf_btn = Button(text='Perf', size_hint_x=0.3)
+        perf_btn.bind(on_release=self.show_perf)
+        btn_layout.add_widget(perf_btn)
+
         output_container.add_widget(btn_layout)
 
         self.add_widget(output_container)
 
+        # Message Logs Section, built when first opened (see build_logs_panel)
+        self.logs_layout = BoxLayout(orientation='vertical', size_hint_y=0.35, padding=5, spacing=5)
+        show_logs_btn = Button(text='Show Message Logs', size_hint_y=None, height=40)
+        show_logs_btn.bind(on_release=self.build_logs_panel)
+        self.logs_layout.add_widget(show_logs_btn)
+        self.add_widget(self.logs_layout)
+        self.startup.mark('widgets built')
+        # The startup breakdown is logged once these have happened too
+        self._startup_pending = {'first frame', 'patterns loaded'}
+
+        # Save the input as a draft once typing pauses for DRAFT_SAVE_DELAY
+        # seconds. One draft row per session, skipped if nothing changed.
+        self.draft_session = uuid.uuid4().hex
+        self.draft_hash = None
+        self._draft_trigger = Clock.create_trigger(self.save_draft, self.DRAFT_SAVE_DELAY)
+        for widget in (self.input_text, self.lang_spinner, self.district_spinner, self.category_spinner):
+            widget.bind(text=self.schedule_draft_save)
+        self.adb.call('get_patterns', callback=self._set_patterns, error=self._show_db_error)
+        self.adb.call('latest_draft', callback=self.restore_draft)
+        # Age old messages out into the monthly archives in the background
+        self.adb.call('archive_messages', error=self._show_db_error)
+
+    def build_logs_panel(self, instance=None):
         # Message Logs Section with filtering (date, district, category)
-        logs_layout = BoxLayout(orientation='vertical', size_hint_y=0.35, padding=5, spacing=5)
+        self.logs_layout.clear_widgets()
 
         # Filters inputs
         filter_controls = BoxLayout(size_hint_y=None, height=40, spacing=5)
@@ -326,7 +301,7 @@ class MessageAppGUI(BoxLayout):
 
         self.filter_district_input = Spinner(
             text='All Districts',
-            values=['', 'Hyd', 'Karachi', 'Lahore', 'Islamabad', 'Multan'],
+            values=[''] + default_gazetteer().names['district'],
             size_hint=(0.3, None),
             height=30
         )
@@ -344,17 +319,54 @@ class MessageAppGUI(BoxLayout):
         filter_btn.bind(on_release=self.filter_logs)
         filter_controls.add_widget(filter_btn)
 
-        logs_layout.add_widget(filter_controls)
+        stats_btn = Button(text='Stats', size_hint=(0.1, None), height=30)
+        stats_btn.bind(on_release=self.show_stats)
+        filter_controls.add_widget(stats_btn)
 
-        # Scrollable output for logs
-        self.logs_output = TextInput(readonly=True, font_size=14)
-        logs_layout.add_widget(self.logs_output)
+        self.logs_layout.add_widget(filter_controls)
 
-        self.add_widget(logs_layout)
+        # One-line summary of message counts for the current filter
+        self.stats_label = Label(text='', size_hint_y=None, height=20, font_size=13)
+        self.stats_label.bind(width=lambda instance, width: setattr(instance, 'text_size', (width, None)))
+        self.logs_layout.add_widget(self.stats_label)
 
-        # Auto-save input every 10 seconds if text changed
-        self.previous_input = ''
-        Clock.schedule_interval(self.autosave_input, 10)
+        # Full-text search over all stored messages
+        search_controls = BoxLayout(size_hint_y=None, height=40, spacing=5)
+        self.search_input = TextInput(
+            hint_text='Search messages (venue, name, ...)',
+            size_hint=(0.9, None),
+            height=30,
+            multiline=False
+        )
+        self.search_input.bind(on_text_validate=self.search_logs)
+        search_controls.add_widget(self.search_input)
+
+        search_btn = Button(text='Search', size_hint=(0.1, None), height=30)
+        search_btn.bind(on_release=self.search_logs)
+        search_controls.add_widget(search_btn)
+
+        self.logs_layout.add_widget(search_controls)
+
+        # Scrollable, virtualized list of logs loaded page by page
+        self.logs_output = LogsView(self.adb)
+        self.logs_layout.add_widget(self.logs_output)
+
+    def _set_patterns(self, patterns):
+        self.pattern_spinner.values = patterns
+        self.startup_step_done('patterns loaded')
+
+    def startup_step_done(self, step):
+        if step not in self._startup_pending:
+            return
+        self._startup_pending.discard(step)
+        if step == 'first frame':
+            self.startup.mark(step)
+        else:
+            # Background steps overlap the phases above
+            self.startup.event(step)
+        if not self._startup_pending:
+            for line in self.startup.report():
+                Logger.info(f"Startup: {line}")
 
     def convert_message(self, instance):
         input_text = self.input_text.text.strip()
@@ -367,52 +379,131 @@ class MessageAppGUI(BoxLayout):
         district = self.district_spinner.text if self.district_spinner.text != "Select District" else "Unknown"
         category = self.category_spinner.text
 
-        # Save input message
-        self.db.save_input_message(input_text, lang, district, category)
-
-        # Translate message to English
-        translated = translate_to_english(input_text, lang)
-        # Save translated message
-        self.db.save_translated_message(translated, district, category)
-
-        # Get selected pattern text
         pattern_name = self.pattern_spinner.text
-        pattern_text = self.db.get_pattern_text(pattern_name)
 
-        # Convert message into pattern
-        converted_text = convert_message_to_pattern(translated, pattern_text)
+        # A paste of several bulletins is converted as a batch
+        messages = split_bulletins(input_text)
+        if len(messages) > 1:
+            self.convert_messages(messages, lang, pattern_name)
+            return
 
-        # Save converted message into database
-        self.db.save_converted_message(converted_text, district, category)
+        @profiler.timed('convert.total')
+        def convert(db):
+            # A forwarded copy of a message already converted with this
+            # pattern (as it is now) gets that conversion back instead of a
+            # new one, and is saved linked to it
+            duplicate = db.find_duplicate(input_text, pattern_name=pattern_name)
+            if duplicate is not None:
+                db.save_duplicate(input_text, lang, duplicate[0], district, category)
+                db.flush()
+                return duplicate[3], (f"Near-duplicate ({duplicate[1]:.0%} alike) of a message converted "
+                                      f"{duplicate[5]}; saved with that conversion.")
+
+            # Translate message to English
+            translated = self.translator.translate(input_text, lang)
+
+            # Get selected pattern text
+            template = db.get_pattern_template(pattern_name)
+
+            # Convert message into pattern
+            converted_text = convert_message_to_pattern(translated, template)
+
+            # Save input, translated and converted message as one row
+            db.save_conversion(input_text, lang, translated, converted_text, district, category, pattern_name)
+            # Only report it saved once the write-behind queue has committed
+            # it; a failed write raises here and is shown as a database error
+            db.flush()
+            return converted_text, "Message converted and saved."
+
+        self.adb.run(convert, callback=lambda result: self._show_converted(*result), error=self._show_db_error)
+
+    def convert_messages(self, messages, lang, pattern_name):
+        # Each message is classified on its own unless a district or category
+        # other than the defaults is selected; all rows are saved in one
+        # transaction and the outputs shown together. Near-duplicates of
+        # earlier conversions are reused as in convert_message.
+        district = self.district_spinner.text if self.district_spinner.text != "Select District" else None
+        category = self.category_spinner.text if self.category_spinner.text != "Others" else None
+
+        @profiler.timed('convert.batch_total')
+        def convert(db):
+            outputs = []
+            fresh = []
+            # (message, id of the message it duplicates)
+            duplicates = []
+            for message in messages:
+                duplicate = db.find_duplicate(message, pattern_name=pattern_name)
+                outputs.append(duplicate[3] if duplicate is not None else None)
+                if duplicate is None:
+                    fresh.append(message)
+                else:
+                    duplicates.append((message, duplicate[0]))
+            if fresh:
+                template = db.get_pattern_template(pattern_name)
+                conversions = convert_batch(fresh, lang, template, self.translator, district, category)
+                db.save_conversions(conversions, pattern_name)
+                converted = iter(conversion[3] for conversion in conversions)
+                outputs = [output if output is not None else next(converted) for output in outputs]
+            for message, duplicate_of in duplicates:
+                db.save_duplicate(message, lang, duplicate_of, district, category)
+            db.flush()
+            status = f"{len(messages)} messages converted and saved"
+            if duplicates:
+                status += f" ({len(duplicates)} reused from earlier conversions)"
+            return '\n\n'.join(outputs), status + "."
+
+        self.adb.run(convert, callback=lambda result: self._show_converted(*result), error=self._show_db_error)
+
+    @profiler.timed('ui.show_converted')
+    def _show_converted(self, converted_text, status):
+        # The message is in the history now; start a fresh draft session
+        self._draft_trigger.cancel()
+        self.db.delete_draft(self.draft_session)
+        self.draft_session = uuid.uuid4().hex
+        self.draft_hash = None
 
         # Show in output box
         self.output_text.text = converted_text
 
-        self.show_popup("Success", "Message converted and saved successfully!")
+        self.notify(status)
 
     def copy_output_text(self, instance):
         text = self.output_text.text
         if text:
             Clipboard.copy(text)
-            self.show_popup("Copied", "Output text copied to clipboard.")
+            self.notify("Output copied to clipboard.")
         else:
             self.show_popup("Error", "No text to copy.")
 
     def clear_input_output(self, instance):
         self.input_text.text = ''
         self.output_text.text = ''
+        # Drop the draft now rather than after the save delay
+        self._draft_trigger.cancel()
+        self.save_draft(0)
 
     def edit_pattern_popup(self, instance):
         pattern_name = self.pattern_spinner.text
-        pattern_text = self.db.get_pattern_text(pattern_name)
-
+        self.adb.call('get_pattern_text', pattern_name,
+                      callback=lambda pattern_text: self._open_pattern_editor(pattern_name, pattern_text),
+                      error=self._show_db_error)
+
+    def _open_pattern_editor(self, pattern_name, pattern_text):
+        # The editor popup is built once and reused
+        if getattr(self, '_pattern_editor', None) is None:
+            self._build_pattern_editor()
+        self._editor_name_input.text = pattern_name
+        self._editor_pattern_input.text = pattern_text
+        self._pattern_editor.open()
+
+    def _build_pattern_editor(self):
         content = BoxLayout(orientation='vertical', padding=10, spacing=10)
-        pattern_input = TextInput(text=pattern_text, multiline=True, size_hint_y=0.8)
-        name_input = TextInput(text=pattern_name, multiline=False, size_hint_y=0.1, readonly=True)
+        self._editor_pattern_input = TextInput(multiline=True, size_hint_y=0.8)
+        self._editor_name_input = TextInput(multiline=False, size_hint_y=0.1, readonly=True)
 
         content.add_widget(Label(text="Edit pattern text for:"))
-        content.add_widget(name_input)
-        content.add_widget(pattern_input)
+        content.add_widget(self._editor_name_input)
+        content.add_widget(self._editor_pattern_input)
 
         btn_layout = BoxLayout(size_hint_y=0.1, spacing=10)
         save_btn = Button(text="Save")
@@ -422,35 +513,56 @@ class MessageAppGUI(BoxLayout):
         btn_layout.add_widget(cancel_btn)
         content.add_widget(btn_layout)
 
-        popup = Popup(title="Edit Pattern", content=content, size_hint=(0.9, 0.7))
-
-        def save_pattern(instance):
-            new_text = pattern_input.text.strip()
-            if len(new_text) > 0:
-                self.db.update_pattern(pattern_name, new_text)
-                self.show_popup("Success", "Pattern updated successfully.")
-                popup.dismiss()
-            else:
-                self.show_popup("Error", "Pattern text cannot be empty.")
-
-        save_btn.bind(on_release=save_pattern)
-        cancel_btn.bind(on_release=lambda x: popup.dismiss())
-
-        popup.open()
+        self._pattern_editor = Popup(title="Edit Pattern", content=content, size_hint=(0.9, 0.7))
+        save_btn.bind(on_release=self._save_edited_pattern)
+        cancel_btn.bind(on_release=lambda x: self._pattern_editor.dismiss())
+
+    def _save_edited_pattern(self, instance):
+        new_text = self._editor_pattern_input.text.strip()
+        if len(new_text) > 0:
+            self.adb.call('update_pattern', self._editor_name_input.text, new_text,
+                          callback=lambda _: self.notify("Pattern updated."),
+                          error=self._show_db_error)
+            self._pattern_editor.dismiss()
+        else:
+            self.show_popup("Error", "Pattern text cannot be empty.")
 
     def show_popup(self, title, message):
-        popup_content = BoxLayout(orientation='vertical', padding=10)
-        popup_content.add_widget(Label(text=message))
-        btn = Button(text='OK', size_hint=(1, 0.3))
-        popup_content.add_widget(btn)
-        popup = Popup(title=title, content=popup_content, size_hint=(0.7, 0.4))
-        btn.bind(on_release=popup.dismiss)
-        popup.open()
-
-    def filter_logs(self, instance):
-        date = self.filter_date_input.text.strip()
-        district = self.filter_district_input.text.strip() or None
-        category = self.filter_category_input.text.strip() or None
+        # One message popup, built on first use and reused afterwards
+        if getattr(self, '_popup', None) is None:
+            popup_content = BoxLayout(orientation='vertical', padding=10)
+            self._popup_label = Label()
+            popup_content.add_widget(self._popup_label)
+            btn = Button(text='OK', size_hint=(1, 0.3))
+            popup_content.add_widget(btn)
+            self._popup = Popup(content=popup_content, size_hint=(0.7, 0.4))
+            btn.bind(on_release=self._popup.dismiss)
+        self._popup.title = title
+        self._popup_label.text = message
+        self._popup.open()
+
+    def notify(self, message):
+        # Non-modal confirmation shown in the status area for TOAST_SECONDS
+        self._toast = message
+        self._update_status()
+        self._toast_trigger.cancel()
+        self._toast_trigger()
+
+    def _clear_toast(self, dt):
+        self._toast = ''
+        self._update_status()
+
+    def _update_status(self):
+        self.busy_label.text = "Working..." if self._busy else self._toast
+
+    def _filter_values(self):
+        # (date, district, category) from the logs filter, None where unset;
+        # shows an error and returns None if the date is malformed
+        date = self.filter_date_input.text.strip() or None
+        district = self.filter_district_input.text.strip()
+        category = self.filter_category_input.text.strip()
+        district = None if district in ('', 'All Districts') else district
+        category = None if category in ('', 'All Categories') else category
 
         # Validate date format if set
         if date:
@@ -458,62 +570,179 @@ class MessageAppGUI(BoxLayout):
                 datetime.strptime(date, '%Y-%m-%d')
             except ValueError:
                 self.show_popup("Error", "Date format must be YYYY-MM-DD")
-                return
+                return None
+        return date, district, category
+
+    def filter_logs(self, instance):
+        values = self._filter_values()
+        if values is None:
+            return
+        date, district, category = values
 
         # Fetch logs from converted_messages table by default
-        logs = self.db.query_messages('converted_messages', date=date, district=district, category=category)
+        self.logs_output.load('converted_messages', date=date, district=district, category=category)
 
-        if not logs:
-            self.logs_output.text = "No messages found for the given filter."
+    def show_stats(self, instance):
+        # Converted messages on the filter date (or the last 7 days), per
+        # district, or per category once a district is chosen
+        values = self._filter_values()
+        if values is None:
             return
+        date, district, category = values
+        if date:
+            start = end = date
+        else:
+            today = datetime.now()
+            start = (today - timedelta(days=6)).strftime('%Y-%m-%d')
+            end = today.strftime('%Y-%m-%d')
+        group_by = 'category' if district else 'district'
+        self.adb.call('stats', start, end, group_by, district=district, category=category,
+                      callback=lambda rows: self._show_stats(start, end, district, category, rows),
+                      error=self._show_db_error)
+
+    def _show_stats(self, start, end, district, category, rows):
+        period = start if start == end else f"{start} to {end}"
+        scope = ' '.join(part for part in (district, f"category {category}" if category else None) if part)
+        counts = ', '.join(f"{name or 'Unknown'} {count}" for name, count in rows) or "none"
+        total = sum(count for _, count in rows)
+        self.stats_label.text = f"{period}{' ' + scope if scope else ''}: {total} messages ({counts})"
+
+    def search_logs(self, instance):
+        query = self.search_input.text.strip()
+        if not query:
+            self.show_popup("Error", "Please enter text to search for.")
+            return
+        # Converted text repeats the input's fields (and the translation is
+        # often the input unchanged), so searching every stage would list
+        # each conversion up to three times
+        self.adb.call('search_messages', query, {'tables': ['converted_messages']}, limit=LogsView.PAGE_SIZE,
+                      callback=self._show_search_results, error=self._show_db_error)
+
+    @profiler.timed('ui.search_results')
+    def _show_search_results(self, results):
+        self.logs_output.show_results(
+            [(snippet, timestamp) for _, _, snippet, timestamp in results],
+            "No messages match the search.")
+
+    def schedule_draft_save(self, instance, value):
+        # Debounce: every change restarts the countdown
+        self._draft_trigger.cancel()
+        self._draft_trigger()
+
+    def save_draft(self, dt):
+        current_input = self.input_text.text.strip()
+        if not current_input:
+            # Emptied input: drop the session's draft so it isn't restored
+            # on the next launch
+            if self.draft_hash is not None:
+                self.db.delete_draft(self.draft_session)
+                self.draft_hash = None
+            return
+        lang = self.lang_spinner.text
+        district = self.district_spinner.text if self.district_spinner.text != "Select District" else "Unknown"
+        category = self.category_spinner.text
 
-        result_text = ""
-        for msg, timestamp in logs:
-            result_text += f"[{timestamp}] {msg}\n\n"
+        content_hash = draft_hash(current_input, lang, district, category)
+        if content_hash != self.draft_hash:
+            # Queued on the write-behind thread, so this never blocks the UI
+            self.draft_hash = self.db.save_draft(self.draft_session, current_input, lang, district, category)
 
-        self.logs_output.text = result_text.strip()
+    def restore_draft(self, draft):
+        # Continue an unsent draft from a previous run
+        if draft is None or self.input_text.text.strip():
+            return
+        self.draft_session, message, lang, district, category = draft
+        self.input_text.text = message
+        self.lang_spinner.text = lang
+        if district != "Unknown":
+            self.district_spinner.text = district
+        self.category_spinner.text = category
+        self.draft_hash = draft_hash(message, lang, district, category)
+
+    def show_perf(self, instance=None):
+        # Debug screen: p50/p95/p99 per stage over the profiler's window ring,
+        # built on first use and reused like the other popups
+        if getattr(self, '_perf_popup', None) is None:
+            content = BoxLayout(orientation='vertical', padding=10, spacing=10)
+            scroll = ScrollView()
+            self._perf_label = Label(size_hint_y=None, font_name='RobotoMono-Regular', font_size=12,
+                                     halign='left', valign='top')
+            self._perf_label.bind(texture_size=lambda instance, size: setattr(instance, 'height', size[1]),
+                                  width=lambda instance, width: setattr(instance, 'text_size', (width, None)))
+            scroll.add_widget(self._perf_label)
+            content.add_widget(scroll)
+
+            btn_layout = BoxLayout(size_hint_y=None, height=40, spacing=5)
+            self._perf_toggle = Button()
+            self._perf_toggle.bind(on_release=self._toggle_profiler)
+            btn_layout.add_widget(self._perf_toggle)
+            for text, handler in (('Refresh', self._refresh_perf), ('Reset', self._reset_perf),
+                                  ('Export Trace', self._export_trace), ('Close', None)):
+                btn = Button(text=text)
+                btn.bind(on_release=handler or (lambda x: self._perf_popup.dismiss()))
+                btn_layout.add_widget(btn)
+            content.add_widget(btn_layout)
+            self._perf_popup = Popup(title="Performance", content=content, size_hint=(0.95, 0.8))
+        self._refresh_perf()
+        self._perf_popup.open()
+
+    def _refresh_perf(self, instance=None):
+        self._perf_toggle.text = "Disable" if profiler.enabled else "Enable"
+        if profiler.enabled or profiler.summary():
+            self._perf_label.text = '\n'.join(profiler.report())
+        else:
+            self._perf_label.text = "Profiling is off. Enable it, use the app, then Refresh."
 
-    def autosave_input(self, dt):
-        current_input = self.input_text.text.strip()
-        if current_input and current_input != self.previous_input:
-            lang = self.lang_spinner.text
-            district = self.district_spinner.text if self.district_spinner.text != "Select District" else "Unknown"
-            category = self.category_spinner.text
+    def _toggle_profiler(self, instance):
+        profiler.enabled = not profiler.enabled
+        self._refresh_perf()
+
+    def _reset_perf(self, instance):
+        profiler.reset()
+        self._refresh_perf()
+
+    def _export_trace(self, instance):
+        # Open in chrome://tracing or ui.perfetto.dev; written next to the database
+        path = os.path.join(os.path.dirname(self.db.db_name), datetime.now().strftime('trace-%Y%m%d-%H%M%S.json'))
+        try:
+            profiler.export_chrome_trace(path)
+        except OSError as e:
+            self.show_popup("Error", f"Could not write trace: {e}")
+            return
+        self.notify(f"Trace saved to {path}")
+
+    def _show_busy(self, pending):
+        self._busy = bool(pending)
+        self._update_status()
 
-            self.db.save_input_message(current_input, lang, district, category)
-            self.previous_input = current_input
+    def _show_db_error(self, error):
+        self.show_popup("Error", f"Database error: {error}")
 
     def on_stop(self):
+        self.adb.close()
+        self.translator.close()
         self.db.close()
 
 
 class MessageApp(App):
     def build(self):
-        return MessageAppGUI()
+        return MessageAppGUI(startup=PhaseTimer('startup'))
+
+    def on_start(self):
+        # Runs on the first clock tick, i.e. once the first frame is up
+        Clock.schedule_once(lambda dt: self.root.startup_step_done('first frame'))
+
+    def on_pause(self):
+        # Android may kill a paused app, so make queued writes durable first
+        try:
+            self.root.db.flush()
+        except sqlite3.Error as e:
+            self.root._show_db_error(e)
+        return True
+
+    def on_stop(self):
+        self.root.on_stop()
 
 
 if __name__ == '__main__':
     MessageApp().run()
-</content>
-</create_file>
-
-<attempt_completion>
-✅ Full Kivy Android app code is provided in a single Python file named `message_app_android.py`.
-
-This app:
-- Allows input of messages (English, Urdu, Sindhi).
-- Lets the user select language, district, and category.
-- Saves input messages with timestamp in a local SQLite DB.
-- Translates (dummy pass-through for now) and stores translated messages.
-- Loads and allows editing of message patterns.
-- Converts input messages to formatted output messages using selected pattern.
-- Saves converted messages with metadata.
-- Filters and queries messages by date, district, and category.
-- Provides GUI with text input/output, pattern selector, and copy/paste functionality.
-- Auto-saves input message every 10 seconds if changed.
-- Works fully offline with local databases.
-
-You can run this script on Termux with Kivy installed, then package with Buildozer for Android APK.
-
-Feel free to ask for assistance with testing, packaging, or adding advanced translation support or any other feature.
-</attempt_completion>
@@ -0,0 +1,188 @@
+# Export of message logs to CSV/JSONL and bulk import back into the
+# database, both streaming. Used by manage_db.py's export and import commands.
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from gazetteer import default_gazetteer
+
+
+EXPORT_COLUMNS = ('id', 'timestamp', 'lang', 'district', 'category', 'message')
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+# Export progress is checkpointed (and the output flushed) this often
+CHECKPOINT_EVERY = 10000
+
+
+class _LineBuffer:
+    # File-like target for csv.writer that hands back what was just written
+    def __init__(self):
+        self._parts = []
+
+    def write(self, text):
+        self._parts.append(text)
+
+    def take(self):
+        text = ''.join(self._parts)
+        self._parts = []
+        return text
+
+
+def export_lines(rows, fmt, header=True):
+    # Generator writer: yields (row, formatted line) for each exported row,
+    # preceded by (None, header line) for CSV
+    if fmt == 'csv':
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_COLUMNS)
+            yield None, buffer.take()
+        for row in rows:
+            writer.writerow(row)
+            yield row, buffer.take()
+    else:
+        for row in rows:
+            yield row, json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n'
+
+
+def read_checkpoint(path):
+    # ((timestamp, id) of the last exported row, output size at that row),
+    # or (None, 0) when starting afresh
+    if path and os.path.exists(path):
+        with open(path) as f:
+            fields = f.read().split('\t')
+            if len(fields) == 3:
+                return (fields[0], int(fields[1])), int(fields[2])
+    return None, 0
+
+
+def write_checkpoint(path, row, size):
+    # Write-then-rename so a crash never leaves a truncated checkpoint
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(f"{row[1]}\t{row[0]}\t{size}")
+    os.replace(tmp, path)
+
+
+def open_export(path, checkpoint=None):
+    # Output file for export_messages(); when resuming, anything written
+    # after the checkpointed row is cut off so no row appears twice
+    after, size = read_checkpoint(checkpoint)
+    if after is None:
+        return open(path, 'w', encoding='utf-8', newline='')
+    os.truncate(path, size)
+    return open(path, 'a', encoding='utf-8', newline='')
+
+
+def export_messages(db, out, fmt='csv', table_name='converted_messages', date=None, district=None,
+                    category=None, checkpoint=None):
+    # Stream a query_messages filter result into `out`, newest first; the
+    # archive files are read too, so an unfiltered export is a complete
+    # backup. With a checkpoint file, a rerun resumes after the last recorded
+    # row (see open_export). Returns the number of rows written.
+    after, _ = read_checkpoint(checkpoint)
+    rows = db.export_messages(table_name, date, district, category, after=after)
+    count = 0
+    last = None
+    for row, line in export_lines(rows, fmt, header=after is None):
+        out.write(line)
+        if row is None:
+            continue
+        count += 1
+        last = row
+        if checkpoint and count % CHECKPOINT_EVERY == 0:
+            out.flush()
+            write_checkpoint(checkpoint, last, out.tell())
+    out.flush()
+    if checkpoint and last is not None:
+        write_checkpoint(checkpoint, last, out.tell())
+    return count
+
+
+def read_records(stream, fmt):
+    # Dicts keyed like EXPORT_COLUMNS, with their 1-based record number
+    if fmt == 'csv':
+        for number, record in enumerate(csv.DictReader(stream), start=1):
+            yield number, record
+    else:
+        for number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _parse_timestamp(value):
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            pass
+    return None
+
+
+class ImportValidator:
+    # Turns raw records into import_messages() rows. District and category
+    # are mapped to their gazetteer names ('hyderabad' -> 'Hyd'); unknown
+    # names are kept as given. Rejected records are counted, and the first
+    # few reasons kept for the report.
+    MAX_ERRORS = 20
+
+    def __init__(self, default_lang=None):
+        self.default_lang = default_lang
+        self.rejected = 0
+        self.errors = []
+        self._gazetteer = default_gazetteer()
+        self._names = {}
+
+    def _canonical(self, kind, value):
+        value = _text(value)
+        if not value:
+            return None
+        key = (kind, value)
+        if key not in self._names:
+            self._names[key] = self._gazetteer.canonical(kind, value) or value
+        return self._names[key]
+
+    def _reject(self, number, reason):
+        self.rejected += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"record {number}: {reason}")
+
+    def rows(self, records):
+        for number, record in records:
+            if not isinstance(record, dict):
+                self._reject(number, "not a JSON object")
+                continue
+            message = record.get('message')
+            if not isinstance(message, str) or not message.strip():
+                self._reject(number, "missing message")
+                continue
+            created_at = _parse_timestamp(_text(record.get('timestamp')))
+            if created_at is None:
+                self._reject(number, f"bad timestamp {record.get('timestamp')!r}")
+                continue
+            yield (created_at, _text(record.get('lang')) or self.default_lang,
+                   self._canonical('district', record.get('district')),
+                   self._canonical('category', record.get('category')), message.strip())
+
+
+def import_messages(db, stream, fmt='csv', table_name='converted_messages', default_lang=None, report=None):
+    # Validate and bulk-load records from `stream`. report(count, rate) is
+    # called after every batch. Returns (imported, rejected, errors, seconds).
+    validator = ImportValidator(default_lang)
+    start = time.perf_counter()
+
+    def progress(count):
+        if report is not None:
+            elapsed = time.perf_counter() - start
+            report(count, count / elapsed if elapsed else 0)
+
+    count = db.import_messages(validator.rows(read_records(stream, fmt)), table_name, progress=progress)
+    return count, validator.rejected, validator.errors, time.perf_counter() - start
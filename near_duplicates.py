@@ -0,0 +1,82 @@
+import hashlib
+import re
+import struct
+import unicodedata
+from functools import lru_cache
+
+
+# MinHash fingerprints for spotting forwarded copies of the same bulletin
+# with small edits (emoji, a corrected time, a signature added at the end).
+# A message is reduced to the set of its two-word shingles; its MinHash
+# signature is cut into BANDS bands of ROWS values and each band hashed to a
+# single integer key. Messages sharing any band key are candidates, and the
+# chance of that rises steeply with their shingle overlap (Jaccard
+# similarity): with 12 bands of 4 rows, ~96% for pairs 70% alike, over 99%
+# for pairs 80% alike, ~0.1% for pairs 10% alike. Candidates are then
+# compared exactly with similarity().
+BANDS = 12
+ROWS = 4
+SHINGLE_WORDS = 2
+
+_WORD_RE = re.compile(r'\w+')
+# Each shingle is hashed into BANDS * ROWS independent 32-bit values by
+# salted BLAKE2b (16 values per 64-byte digest); the signature is the
+# minimum of each value over all shingles
+_VALUES_PER_DIGEST = 16
+_HASHERS = [hashlib.blake2b(salt=bytes([i]) * 16)
+            for i in range(-(-BANDS * ROWS // _VALUES_PER_DIGEST))]
+_UNPACK = struct.Struct(f'<{_VALUES_PER_DIGEST * len(_HASHERS)}I').unpack
+_MASK = (1 << 64) - 1
+
+
+def _signature(shingle_set):
+    hashes = []
+    for shingle in shingle_set:
+        data = shingle.encode('utf-8')
+        digests = []
+        for hasher in _HASHERS:
+            hasher = hasher.copy()
+            hasher.update(data)
+            digests.append(hasher.digest())
+        hashes.append(_UNPACK(b''.join(digests)))
+    return [min(column) for column in zip(*hashes)]
+
+
+def shingles(text):
+    # Two-word runs of the casefolded words, ignoring emoji, punctuation and
+    # spacing; messages shorter than that are one shingle
+    words = _WORD_RE.findall(unicodedata.normalize('NFKC', text).casefold())
+    if len(words) <= SHINGLE_WORDS:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def jaccard(a, b):
+    # Similarity of two shingle sets, in [0, 1]
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def similarity(a, b):
+    # Jaccard similarity of two messages' shingle sets
+    return jaccard(shingles(a), shingles(b))
+
+
+# Cached: convert_message looks a message up and then saves it
+@lru_cache(maxsize=256)
+def band_keys(text):
+    # The BANDS lookup keys of a message (signed 64-bit, as SQLite stores
+    # integers), or () for a message without words
+    shingle_set = shingles(text)
+    if not shingle_set:
+        return ()
+    signature = _signature(shingle_set)
+    keys = []
+    for band in range(BANDS):
+        # FNV-style mix of the band number and its values into 64 bits
+        key = band
+        for value in signature[band * ROWS:(band + 1) * ROWS]:
+            key = ((key ^ value) * 0x100000001B3) & _MASK
+        keys.append(key - (1 << 64) if key >> 63 else key)
+    return tuple(keys)
@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+from string import Formatter
+
+
+# A message pattern parsed once into literal text and placeholders, so that
+# rendering it does not re-parse the format string on every conversion
+class PatternTemplate:
+    def __init__(self, text):
+        self.text = text
+        self.fields = []
+        self._parts = []
+        # Patterns using positional or nested fields ('{}', '{0}', '{a:{w}}')
+        # can't be rendered from extracted fields; render() raises for them
+        self.valid = True
+        try:
+            for literal, field, spec, conversion in Formatter().parse(text):
+                if field is not None:
+                    name = field.split('.', 1)[0].split('[', 1)[0]
+                    if not name or name.isdigit() or '{' in (spec or ''):
+                        self.valid = False
+                    elif name not in self.fields:
+                        self.fields.append(name)
+                self._parts.append((literal, field, spec, conversion))
+        except ValueError:
+            # Unbalanced braces
+            self.valid = False
+
+    def render(self, data):
+        # data: placeholder name -> value. Raises ValueError/KeyError like
+        # str.format would if the pattern can't be filled in.
+        if not self.valid:
+            raise ValueError("pattern has positional or malformed placeholders")
+        formatter = Formatter()
+        out = []
+        for literal, field, spec, conversion in self._parts:
+            out.append(literal)
+            if field is None:
+                continue
+            if field in data:
+                value = data[field]
+            else:
+                value = formatter.get_field(field, (), data)[0]
+            if conversion:
+                value = formatter.convert_field(value, conversion)
+            out.append(format(value, spec))
+        return ''.join(out)
+
+
+# Small LRU of compiled templates keyed by (pattern name, version). Shared
+# by the database connections of all worker threads, hence the lock.
+class TemplateCache:
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+            return template
+
+    def put(self, key, template):
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+
+    def invalidate(self, pattern_name):
+        with self._lock:
+            for key in [key for key in self._templates if key[0] == pattern_name]:
+                del self._templates[key]
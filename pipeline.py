@@ -0,0 +1,73 @@
+from extraction import extractor_for
+from gazetteer import default_gazetteer
+from pattern_template import PatternTemplate
+from profiling import profiler
+from translation_cache import TranslationCache
+
+# Bump whenever translate_to_english starts producing different output, so
+# cached translations from the old engine are not reused
+TRANSLATION_ENGINE_VERSION = 'passthrough-1'
+
+
+# Translation Helper (Dummy - replace with actual translation if needed)
+@profiler.timed('pipeline.translate')
+def translate_to_english(text, lang):
+    # For simplicity, this function returns text as-is for English
+    # For Urdu and Sindhi, you can integrate any offline translation approach here
+    # For now, just return input text
+    if lang.lower() == 'english':
+        return text
+    elif lang.lower() in ('urdu', 'sindhi'):
+        # Here place your translation engine or logic. Dummy returns original text
+        return text
+    else:
+        return text
+
+
+# translate_to_english behind the two-tier translation cache
+def make_translator(db_name='messages.db'):
+    return TranslationCache(translate_to_english, TRANSLATION_ENGINE_VERSION, db_name)
+
+
+# Parsing Input for Extracting District and Category: districts and category
+# keywords come from the gazetteer data file (see gazetteer.txt)
+@profiler.timed('pipeline.classify')
+def parse_area_category(text):
+    found = default_gazetteer().classify(text)
+    return found.get('district', "Unknown"), found.get('category', "Others")
+
+
+# Message Conversion Helper: Replace placeholders in pattern by extracting info from input text.
+# Field rules (labels in English/Urdu/Sindhi, value regexes) live in extraction.py
+@profiler.timed('pipeline.convert')
+def convert_message_to_pattern(input_text, pattern):
+    # pattern: a PatternTemplate, or pattern text to compile on the spot
+    template = pattern if isinstance(pattern, PatternTemplate) else PatternTemplate(pattern)
+
+    # Only the rules for placeholders this pattern actually uses are run
+    with profiler.stage('pipeline.extract'):
+        data, _ = extractor_for(tuple(template.fields)).extract(input_text)
+
+    # Format pattern by replacing placeholders
+    with profiler.stage('pipeline.render'):
+        try:
+            formatted_text = template.render(data)
+        except Exception:
+            formatted_text = input_text  # fallback to original input if format fails
+
+    return formatted_text
+
+
+# Several bulletins (e.g. from splitter.split_bulletins) through translate ->
+# classify -> convert in one pass, translating repeated messages once.
+# district/category, when given, override what each message is classified
+# as. Returns the tuples DatabaseManager.save_conversions stores.
+@profiler.timed('pipeline.convert_batch')
+def convert_batch(messages, lang, template, translator, district=None, category=None):
+    translations = translator.translate_many([(message, lang) for message in messages])
+    conversions = []
+    for message, translated in zip(messages, translations):
+        found_district, found_category = parse_area_category(translated)
+        conversions.append((message, lang, translated, convert_message_to_pattern(translated, template),
+                            district or found_district, category or found_category))
+    return conversions
@@ -0,0 +1,205 @@
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+# Wall-clock breakdown of a multi-step process such as app startup. mark()
+# ends the current phase and starts the next; event() records when some
+# background step finished without starting a new phase.
+class PhaseTimer:
+    def __init__(self, name):
+        self.name = name
+        self.start = self._last = time.perf_counter()
+        # (name, duration or None for events, time since start), in seconds
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((phase, now - self._last, now - self.start))
+            self._last = now
+
+    def event(self, name):
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, None, now - self.start))
+
+    def report(self):
+        with self._lock:
+            phases = list(self.phases)
+        lines = [f"{self.name} breakdown:"]
+        for phase, duration, at in phases:
+            took = f"{duration * 1000:8.1f} ms" if duration is not None else " " * 8 + "   "
+            lines.append(f"  {phase:<28}{took}  (at {at * 1000:.1f} ms)")
+        return lines
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+# Stage timings for finding where a slow conversion spends its time. Every
+# duration goes into a log-bucketed histogram for its stage; histograms are
+# kept per time window in a ring (the last `windows` windows), so memory is
+# fixed however long the app runs. The most recent individual timings are
+# also kept, for export as a Chrome trace (chrome://tracing, Perfetto).
+# While disabled, timed() and stage() cost one attribute check.
+class Profiler:
+    # Bucket i holds durations up to 2 ** ((i + 1) / 4) microseconds (about
+    # 19% resolution), the last one everything above ~2 minutes
+    BUCKETS_PER_OCTAVE = 4
+    BUCKETS = 27 * 4
+
+    def __init__(self, window_seconds=60, windows=10, trace_events=20000, enabled=False):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        # (window number, {stage: bucket counts}), oldest first
+        self._windows = deque(maxlen=windows)
+        # (stage, start, duration, thread id)
+        self._events = deque(maxlen=trace_events)
+        self._thread_names = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        # Context manager timing the enclosed block as stage `name`
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def timed(self, name):
+        # Decorator timing every call of a function as stage `name`
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def timed_methods(self, prefix):
+        # Class decorator: time every public method as stage 'prefix.name'.
+        # Generator methods are left alone (a call only creates the generator).
+        def decorate(cls):
+            for attr, value in list(vars(cls).items()):
+                if attr.startswith('_') or not inspect.isfunction(value) or inspect.isgeneratorfunction(value):
+                    continue
+                setattr(cls, attr, self.timed(f"{prefix}.{attr}")(value))
+            return cls
+        return decorate
+
+    def _bucket(self, duration):
+        micros = duration * 1e6
+        if micros <= 1:
+            return 0
+        return min(int(math.log2(micros) * self.BUCKETS_PER_OCTAVE), self.BUCKETS - 1)
+
+    def record(self, name, start, duration):
+        bucket = self._bucket(duration)
+        window = int(time.monotonic() // self.window_seconds)
+        thread = threading.current_thread()
+        with self._lock:
+            if not self._windows or self._windows[-1][0] != window:
+                self._windows.append((window, {}))
+            counts = self._windows[-1][1].get(name)
+            if counts is None:
+                counts = self._windows[-1][1][name] = [0] * self.BUCKETS
+            counts[bucket] += 1
+            self._events.append((name, start, duration, thread.ident))
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+            self._events.clear()
+
+    def _bucket_limit(self, bucket):
+        # Upper bound of a bucket, in seconds
+        return 2 ** ((bucket + 1) / self.BUCKETS_PER_OCTAVE) / 1e6
+
+    def summary(self, percentiles=(50, 95, 99)):
+        # {stage: (count, [duration at each percentile, in seconds])} over
+        # every window still in the ring. Durations are bucket upper bounds.
+        with self._lock:
+            totals = {}
+            for _, stages in self._windows:
+                for name, counts in stages.items():
+                    total = totals.setdefault(name, [0] * self.BUCKETS)
+                    for i, count in enumerate(counts):
+                        total[i] += count
+        result = {}
+        for name, counts in totals.items():
+            count = sum(counts)
+            values = []
+            for p in percentiles:
+                wanted = count * p / 100
+                seen = 0
+                for bucket, bucket_count in enumerate(counts):
+                    seen += bucket_count
+                    if seen >= wanted:
+                        break
+                values.append(self._bucket_limit(bucket))
+            result[name] = (count, values)
+        return result
+
+    def report(self):
+        # summary() as text lines, slowest p99 first, times in milliseconds
+        lines = [f"{'stage':<34}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        rows = sorted(self.summary().items(), key=lambda item: item[1][1][-1], reverse=True)
+        for name, (count, values) in rows:
+            lines.append(f"{name:<34}{count:>7}" + ''.join(f"{value * 1000:>9.3f}" for value in values))
+        return lines
+
+    def chrome_trace(self):
+        # The recorded timings in Chrome's Trace Event format
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in thread_names.items()]
+        trace.extend({'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                      'ts': round(start * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+                     for name, start, duration, tid in events)
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+# Shared by the pipeline, the database layer and the GUI. Set
+# MESSAGE_APP_PROFILE=1 to have it enabled from startup.
+profiler = Profiler(enabled=os.environ.get('MESSAGE_APP_PROFILE') == '1')
@@ -0,0 +1,105 @@
+import re
+
+from extraction import FIELD_RULES, extractor_for
+
+
+# Splits a paste of several bulletins into one message per bulletin.
+# Boundaries, strongest first:
+#   - separator lines ("-----", "=====", "➖➖➖") are dropped and always split
+#   - WhatsApp chat-export prefixes ("[10/05/25, 11:32] Name: ...") start a
+#     new message and are stripped
+#   - a line opening with a header emoji (🛑, 🔴, 📌, ...) starts a new message
+#   - a labelled field that the current bulletin already has ("Venue:" twice)
+#     starts a new one, taking the unlabelled header lines just above it along
+#   - a blank line starts a new message only if the paragraph after it opens
+#     like a bulletin (an activity, an organizer or any two fields in its
+#     first two lines), and is kept as a blank line inside the current
+#     bulletin otherwise. Pastes with no blank lines, separators or headers
+#     between bulletins can only be split on repeated labels.
+SEPARATOR_RE = re.compile(r'^(?:[-_=*~.•·#+—–━─═➖〰]️?\s*){3,}$')
+WHATSAPP_PREFIX_RE = re.compile(
+    r'^\[?\d{1,2}[/.-]\d{1,2}(?:[/.-]\d{2,4})?,?\s+\d{1,2}:\d{2}(?::\d{2})?(?:\s*[ap]\.?m\.?)?\]?'
+    r'\s*(?:-\s*)?[^:\n]{1,40}:\s?', re.IGNORECASE)
+HEADER_EMOJI = ('🛑', '🔴', '🚨', '📌', '📢', '📣', '⭕', '🔻', '🟥', '❗', '‼', '🔥', '💥', '🚩')
+# Fields whose presence marks the opening of a bulletin
+HEADER_FIELDS = ('activity', 'activist')
+# ...as does finding at least this many fields of any kind, or a first line
+# like "Press conference by Traders Committee at ..."
+OPENING_FIELDS = 2
+OPENING_LINE_RE = re.compile(r'^[\W_]*[^:\n]{1,60}?\sby\s+[A-Z]')
+
+
+def _opens_bulletin(lines):
+    # Whether the first two lines of a paragraph look like the start of a
+    # bulletin rather than more text about the one before it
+    if OPENING_LINE_RE.match(lines[0]):
+        return True
+    _, confidence = extractor_for(tuple(FIELD_RULES)).extract('\n'.join(lines[:2]))
+    found = [name for name, score in confidence.items() if score > 0]
+    return any(name in HEADER_FIELDS for name in found) or len(found) >= OPENING_FIELDS
+
+
+def split_bulletins(text):
+    # Returns the messages in `text`, each stripped; a single bulletin comes
+    # back as a one-element list
+    labelled = extractor_for(tuple(FIELD_RULES))
+    # [lines, fields seen, whether it began at a blank line], in order
+    segments = []
+    current = None
+    blank = False
+
+    def start(lines=(), soft=False):
+        segment = [list(lines), set(), soft]
+        for line in segment[0]:
+            field = labelled.label_field(line)
+            if field is not None:
+                segment[1].add(field)
+        segments.append(segment)
+        return segment
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if SEPARATOR_RE.match(stripped):
+            current, blank = None, False
+            continue
+        prefix = WHATSAPP_PREFIX_RE.match(stripped)
+        if prefix is not None:
+            current, blank = start(), False
+            line = stripped = stripped[prefix.end():].strip()
+        if not stripped:
+            blank = current is not None and bool(current[0])
+            continue
+        field = labelled.label_field(line)
+        if current is None:
+            current = start()
+        elif current[0] and stripped.startswith(HEADER_EMOJI):
+            current = start()
+        elif field is not None and field in current[1]:
+            # Unlabelled lines since the last labelled one belong to the new bulletin
+            lines = current[0]
+            cut = len(lines)
+            while cut > 0 and labelled.label_field(lines[cut - 1]) is None:
+                cut -= 1
+            moved = lines[cut:] if cut > 0 else []
+            del lines[len(lines) - len(moved):]
+            current = start(moved)
+        elif blank and (field is None or field in HEADER_FIELDS):
+            current = start(soft=True)
+        elif blank:
+            current[0].append('')
+        blank = False
+        current[0].append(line.rstrip())
+        if field is not None:
+            current[1].add(field)
+
+    # A paragraph split off at a blank line that doesn't open like a bulletin
+    # goes back into the message before it
+    messages = []
+    for lines, _, soft in segments:
+        if not lines:
+            continue
+        if soft and messages and not _opens_bulletin(lines):
+            messages[-1] += '\n\n' + '\n'.join(lines)
+        else:
+            messages.append('\n'.join(lines))
+    return [message.strip() for message in messages if message.strip()]
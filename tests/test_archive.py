@@ -0,0 +1,125 @@
+import csv
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+import message_io
+from database import DatabaseManager
+
+# Mid-month, so every row is in one archive month whatever the timezone
+OLD = int(datetime(2025, 1, 15).timestamp())
+
+
+def old_rows(count, start=0):
+    return [(OLD + start + i, 'English', 'Hyderabad', 'B', f"Rally {start + i} at Press Club") for i in range(count)]
+
+
+def archived_count(db, month='2025-01'):
+    return db.conn.execute(f"SELECT COUNT(*) FROM {db._archive(month)}.messages").fetchone()[0]
+
+
+def main_count(db):
+    return db.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+def test_ids_not_reused_after_archiving_everything(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'messages.db'))
+    db.import_messages(old_rows(3))
+    assert db.archive_messages() == 3
+    assert main_count(db) == 0
+
+    # Same month again, into an emptied main table
+    db.import_messages(old_rows(3, start=100))
+    assert db.conn.execute("SELECT MIN(id) FROM messages").fetchone()[0] > 3
+    assert db.archive_messages() == 3
+    assert main_count(db) == 0
+    assert archived_count(db) == 6
+    assert len(db.query_messages('converted_messages', date='2025-01-15')) == 6
+    db.close()
+
+
+def test_upgrade_keeps_rows_with_reused_ids(tmp_path):
+    # Archived, emptied and refilled before migration 10: the new rows
+    # reused the archived ids
+    path = str(tmp_path / 'messages.db')
+
+    class Version9(DatabaseManager):
+        MIGRATIONS = DatabaseManager.MIGRATIONS[:9]
+
+    db = Version9(path)
+    db.import_messages(old_rows(3))
+    db.archive_messages()
+    db.import_messages(old_rows(3, start=100))
+    assert db.conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] == 3
+    db.close()
+
+    db = DatabaseManager(path)
+    # New rows get ids above the archived ones
+    db.import_messages(old_rows(2, start=200))
+    assert db.conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] == 5
+    assert db.archive_messages() == 2
+    # The rows with reused ids can't go into the archive, but aren't lost
+    assert main_count(db) + archived_count(db) == 8
+    assert len(db.query_messages('converted_messages', date='2025-01-15')) == 8
+    db.close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ('ok',)
+    conn.close()
+
+
+def test_undated_reads_include_every_archive(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'messages.db'))
+    # More archive months than can be attached at once, plus recent rows
+    months = DatabaseManager.MAX_ATTACHED_ARCHIVES + 2
+    db.import_messages([(int(datetime(2024, month, 15).timestamp()), 'English', 'Hyderabad', 'B',
+                         f"Rally {month} at Press Club") for month in range(1, months + 1)])
+    db.import_messages([(int(time.time()) - i, 'English', 'Hyderabad', 'B', f"Rally recent {i} at Press Club")
+                        for i in range(3)])
+    assert db.archive_messages() == months
+    assert len(db.archive_months()) == months
+
+    expected = months + 3
+    assert len(db.query_messages('converted_messages')) == expected
+    rows = list(db.iter_messages('converted_messages', page_size=2))
+    assert len(rows) == expected
+    # Newest first across the main database and every archive
+    assert [row[2] for row in rows] == sorted((row[2] for row in rows), reverse=True)
+    exported = list(db.export_messages('converted_messages'))
+    assert [row[0] for row in exported] == [row[0] for row in rows]
+    found = db.search_messages('Press Club', filters={'tables': ['converted_messages']}, limit=100)
+    assert len(found) == expected
+    db.close()
+
+
+def test_export_resumes_across_archives(tmp_path, monkeypatch):
+    db = DatabaseManager(str(tmp_path / 'messages.db'))
+    months = DatabaseManager.MAX_ATTACHED_ARCHIVES + 2
+    db.import_messages([(int(datetime(2024, month, 15).timestamp()) + i, 'English', 'Hyderabad', 'B',
+                         f"Rally {month}-{i} at Press Club") for month in range(1, months + 1) for i in range(3)])
+    db.archive_messages()
+    monkeypatch.setattr(message_io, 'CHECKPOINT_EVERY', 2)
+    path, checkpoint = str(tmp_path / 'logs.csv'), str(tmp_path / 'logs.ckpt')
+
+    # Interrupted in the second group of archives...
+    export_messages = db.export_messages
+
+    def interrupted(*args, **kwargs):
+        for i, row in enumerate(export_messages(*args, **kwargs)):
+            if i == 3 * DatabaseManager.MAX_ATTACHED_ARCHIVES + 1:
+                raise KeyboardInterrupt
+            yield row
+
+    monkeypatch.setattr(db, 'export_messages', interrupted)
+    with message_io.open_export(path, checkpoint) as out:
+        with pytest.raises(KeyboardInterrupt):
+            message_io.export_messages(db, out, checkpoint=checkpoint)
+    monkeypatch.setattr(db, 'export_messages', export_messages)
+    # ...and resumed: every archived row exactly once
+    with message_io.open_export(path, checkpoint) as out:
+        message_io.export_messages(db, out, checkpoint=checkpoint)
+    with open(path, encoding='utf-8', newline='') as f:
+        ids = [int(record['id']) for record in csv.DictReader(f)]
+    assert sorted(ids) == list(range(1, 3 * months + 1))
+    db.close()
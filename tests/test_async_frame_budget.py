@@ -0,0 +1,62 @@
+import queue
+import time
+
+import pytest
+
+from database import AsyncDatabase, DatabaseManager
+
+ROWS = 100000
+FRAME = 1 / 60
+# A tick may come late, but never by a whole frame (i.e. no dropped frame)
+MAX_TICK_INTERVAL = 2 * FRAME
+
+
+# Stand-in for Kivy's Clock: schedule_once() may be called from any thread,
+# tick() runs what was scheduled on the thread driving the loop
+class MainLoop:
+    def __init__(self):
+        self._scheduled = queue.Queue()
+
+    def schedule_once(self, fn):
+        self._scheduled.put(fn)
+
+    def tick(self):
+        while True:
+            try:
+                fn = self._scheduled.get_nowait()
+            except queue.Empty:
+                return
+            fn()
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    db = DatabaseManager(str(tmp_path_factory.mktemp('frames') / 'messages.db'))
+    db.import_messages((1735689600 + i * 300, 'English', 'Hyderabad', 'B', f"Rally {i} at Press Club")
+                       for i in range(ROWS))
+    yield db
+    db.close()
+
+
+def test_query_on_worker_keeps_frames(db):
+    loop = MainLoop()
+    adb = AsyncDatabase(db, dispatch=loop.schedule_once)
+    results = []
+    try:
+        adb.call('query_messages', 'converted_messages', callback=results.append)
+        intervals = []
+        last = time.perf_counter()
+        deadline = last + 30
+        while not results and last < deadline:
+            time.sleep(max(0, last + FRAME - time.perf_counter()))
+            now = time.perf_counter()
+            intervals.append(now - last)
+            last = now
+            loop.tick()
+    finally:
+        adb.close()
+
+    assert results and len(results[0]) == ROWS
+    # The query has to span several frames for this to mean anything
+    assert len(intervals) >= 3
+    assert max(intervals) < MAX_TICK_INTERVAL, [round(interval * 1000, 1) for interval in intervals]
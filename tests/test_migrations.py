@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+
+
+def user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_failed_step_leaves_nothing_behind(tmp_path):
+    path = str(tmp_path / 'messages.db')
+    DatabaseManager(path).close()
+    version = user_version(path)
+
+    # A step whose DDL runs before a statement that fails
+    class Failing(DatabaseManager):
+        MIGRATIONS = DatabaseManager.MIGRATIONS + [[
+            "CREATE TABLE half_done (x INTEGER)",
+            "CREATE TRIGGER half_done_insert AFTER INSERT ON half_done BEGIN SELECT 1; END",
+            "INSERT INTO no_such_table VALUES (1)",
+        ]]
+
+    with pytest.raises(sqlite3.OperationalError):
+        Failing(path)
+    assert user_version(path) == version
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'half_done%'").fetchall() == []
+    conn.close()
+    DatabaseManager(path).close()
+
+
+def test_reopens_step_left_half_applied(tmp_path):
+    # What an interrupted migration 7 looked like before steps ran in an
+    # explicit transaction: its trigger committed, the version still 6
+    path = str(tmp_path / 'messages.db')
+    db = DatabaseManager(path)
+    db.save_conversion('Rally at Press Club', 'English', 'Rally at Press Club', 'Rally', 'Hyderabad', 'B')
+    db.close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE daily_counts")
+    conn.execute("DROP TABLE deferred_import")
+    conn.execute("DROP TABLE message_fingerprints")
+    conn.execute("PRAGMA user_version = 6")
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(path)
+    assert user_version(path) == len(DatabaseManager.MIGRATIONS)
+    assert db.stats('2000-01-01', '2100-01-01', group_by=()) == [(1,)]
+    db.close()
+
+
+def test_added_column_is_not_added_twice(tmp_path):
+    # Migration 3 interrupted after its ALTER TABLE, before the version bump
+    path = str(tmp_path / 'messages.db')
+
+    class Version2(DatabaseManager):
+        MIGRATIONS = DatabaseManager.MIGRATIONS[:2]
+
+    Version2(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("ALTER TABLE patterns ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    conn.commit()
+    conn.close()
+
+    DatabaseManager(path).close()
+    assert user_version(path) == len(DatabaseManager.MIGRATIONS)
@@ -0,0 +1,45 @@
+from database import DatabaseManager
+
+BULLETIN = ("Protest demonstration by PTI\nAgenda: Against load shedding\n"
+            "Venue: Press Club, Hyderabad\nTime: 1100 hrs\nStr: 150")
+FORWARDED = BULLETIN + "\n-- forwarded by Ali"
+
+
+def converted_db():
+    db = DatabaseManager(':memory:')
+    db.save_conversion(BULLETIN, 'English', BULLETIN, 'converted v1', 'Hyderabad', 'B', 'Default Pattern')
+    return db
+
+
+def test_finds_forwarded_copy():
+    db = converted_db()
+    duplicate = db.find_duplicate(FORWARDED, pattern_name='Default Pattern')
+    assert duplicate is not None
+    assert duplicate[0] == 1 and duplicate[3] == 'converted v1' and duplicate[1] >= db.DUPLICATE_THRESHOLD
+    assert db.find_duplicate("Meeting of the teachers association at the DC office") is None
+    db.close()
+
+
+def test_edited_pattern_is_not_reused():
+    db = converted_db()
+    db.update_pattern('Default Pattern', "{activity} at {venue}")
+    assert db.find_duplicate(FORWARDED, pattern_name='Default Pattern') is None
+    # Without a pattern any earlier conversion counts
+    assert db.find_duplicate(FORWARDED) is not None
+    db.close()
+
+
+def test_saved_duplicate_links_and_counts():
+    db = converted_db()
+    db.save_duplicate(FORWARDED, 'English', 1)
+    row = db.conn.execute("SELECT input, converted, duplicate_of, district_id, pattern_version FROM messages "
+                          "WHERE id = 2").fetchone()
+    assert row == (FORWARDED, 'converted v1', 1, 1, 1)
+    assert db.stats('2000-01-01', '2100-01-01', group_by=()) == [(2,)]
+    # The copy is fingerprinted too (and matches itself exactly)
+    assert db.find_duplicate(FORWARDED)[0] == 2
+    # Nothing is saved, or fingerprinted, for a message that is gone
+    db.save_duplicate("Rally by JI at Clock Tower", 'English', 99)
+    assert db.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 2
+    assert db.conn.execute("SELECT COUNT(DISTINCT message_id) FROM message_fingerprints").fetchone()[0] == 2
+    db.close()
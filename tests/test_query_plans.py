@@ -0,0 +1,50 @@
+import re
+
+import pytest
+
+from database import DatabaseManager
+
+FILTER_VALUES = {'date': '2025-06-15', 'district': 'Hyderabad', 'category': 'B'}
+# A plan step reading a whole table; "SCAN m USING INDEX ..." walks an index
+# in order (for ORDER BY ... LIMIT) and is fine
+FULL_SCAN_RE = re.compile(r'^SCAN (?!.*\bUSING\b)')
+
+
+def filter_combinations():
+    names = list(FILTER_VALUES)
+    for mask in range(2 ** len(names)):
+        yield {name: FILTER_VALUES[name] for i, name in enumerate(names) if mask & (1 << i)}
+
+
+@pytest.fixture
+def db():
+    db = DatabaseManager(':memory:')
+    db.save_conversion('Rally at Press Club', 'English', 'Rally at Press Club', 'Rally', 'Hyderabad', 'B')
+    yield db
+    db.close()
+
+
+def query_plans(db, call):
+    # EXPLAIN QUERY PLAN of every statement `call` runs, with its parameters
+    # bound (the trace callback gets the expanded SQL)
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.conn.set_trace_callback(None)
+    return {sql: [row[3] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            for sql in statements if sql.lstrip().upper().startswith('SELECT')}
+
+
+@pytest.mark.parametrize('filters', list(filter_combinations()),
+                         ids=lambda filters: '+'.join(filters) or 'none')
+@pytest.mark.parametrize('method', ['query_messages', 'query_messages_page'])
+def test_log_filters_use_indexes(db, method, filters):
+    plans = query_plans(db, lambda: getattr(db, method)('converted_messages', **filters))
+    assert plans
+    for sql, plan in plans.items():
+        assert not [step for step in plan if FULL_SCAN_RE.match(step)], (sql, plan)
+        if filters:
+            # The messages table itself is searched, not walked
+            assert any(step.startswith('SEARCH m USING INDEX') for step in plan), (sql, plan)
@@ -0,0 +1,188 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from profiling import profiler
+
+
+def normalize_text(text):
+    # Forwarded copies of a message often differ only in Unicode composition
+    # or trailing spaces; keep the line structure, which matters for parsing
+    text = unicodedata.normalize('NFC', text)
+    return '\n'.join(line.rstrip() for line in text.strip().splitlines())
+
+
+# Two-tier cache in front of a translation engine: an in-memory LRU, then the
+# translation_cache table (created by DatabaseManager's migrations), keyed by
+# a hash of the normalized text, the language and the engine version so that
+# upgrading the engine never serves stale translations.
+class TranslationCache:
+    # Languages the engine returns unchanged; not worth caching
+    PASSTHROUGH_LANGS = ('english',)
+    # Rows are evicted (least recently used first) once the table grows past
+    # max_rows, checked every EVICT_EVERY new rows
+    EVICT_EVERY = 500
+    # Hits only note the time in memory; last_used is written together with
+    # the next new rows, or on its own once this many keys are waiting
+    TOUCH_EVERY = 500
+
+    def __init__(self, translate, engine_version, db_name='messages.db', memory_size=1024, max_rows=100000):
+        self.translate_fn = translate
+        self.engine_version = engine_version
+        self.db_name = db_name
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._inserted = 0
+        self._touched = {}
+
+    def _conn(self):
+        # One connection per thread, like the database workers. The database
+        # is in WAL mode, where NORMAL only syncs at checkpoints; a lost
+        # cache row just means translating again.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.db_name)
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def key(self, text, lang):
+        data = f"{self.engine_version}\0{lang.lower()}\0{normalize_text(text)}"
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def translate(self, text, lang):
+        return self.translate_many([(text, lang)])[0]
+
+    @profiler.timed('translation_cache.translate_many')
+    def translate_many(self, items):
+        # items: list of (text, lang). Identical inputs are translated once;
+        # returns the translations in the same order.
+        results = [None] * len(items)
+        wanted = OrderedDict()
+        for i, (text, lang) in enumerate(items):
+            if lang.lower() in self.PASSTHROUGH_LANGS:
+                results[i] = self.translate_fn(text, lang)
+            else:
+                wanted.setdefault(self.key(text, lang), (text, lang, []))[2].append(i)
+        if not wanted:
+            return results
+
+        found = {}
+        now = int(time.time())
+        with self._lock:
+            for key in wanted:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self._touched[key] = now
+            self.memory_hits += len(found)
+
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            from_disk = self._load(missing)
+            with self._lock:
+                self.disk_hits += len(from_disk)
+            found.update(from_disk)
+
+        new = {}
+        for key, (text, lang, _) in wanted.items():
+            if key not in found:
+                new[key] = found[key] = self.translate_fn(text, lang)
+        if new:
+            with self._lock:
+                self.misses += len(new)
+            self._store(new)
+        elif len(self._touched) >= self.TOUCH_EVERY:
+            self.flush()
+
+        with self._lock:
+            for key, translation in found.items():
+                self._memory[key] = translation
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+        for key, (_, _, positions) in wanted.items():
+            for i in positions:
+                results[i] = found[key]
+        return results
+
+    def _load(self, keys):
+        # Read-only: last_used is noted in memory and written later
+        conn = self._conn()
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            marks = ','.join('?' * len(batch))
+            found.update(conn.execute(
+                f"SELECT key, translation FROM translation_cache WHERE key IN ({marks})", batch).fetchall())
+        now = int(time.time())
+        with self._lock:
+            for key in found:
+                self._touched[key] = now
+        return found
+
+    def _take_touched(self):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        return [(last_used, key) for key, last_used in touched.items()]
+
+    def _store(self, translations):
+        conn = self._conn()
+        now = int(time.time())
+        touched = self._take_touched()
+        with conn:
+            conn.executemany("UPDATE translation_cache SET last_used = ? WHERE key = ?", touched)
+            conn.executemany(
+                "INSERT OR REPLACE INTO translation_cache (key, translation, last_used) VALUES (?, ?, ?)",
+                [(key, translation, now) for key, translation in translations.items()])
+        self._inserted += len(translations)
+        if self._inserted >= self.EVICT_EVERY:
+            self._inserted = 0
+            self.evict()
+
+    def flush(self):
+        # Writes the last_used times noted since the last write
+        touched = self._take_touched()
+        if touched:
+            conn = self._conn()
+            with conn:
+                conn.executemany("UPDATE translation_cache SET last_used = ? WHERE key = ?", touched)
+
+    def evict(self):
+        self.flush()
+        conn = self._conn()
+        with conn:
+            count = conn.execute("SELECT COUNT(*) FROM translation_cache").fetchone()[0]
+            if count > self.max_rows:
+                conn.execute(
+                    "DELETE FROM translation_cache WHERE key IN "
+                    "(SELECT key FROM translation_cache ORDER BY last_used LIMIT ?)",
+                    (count - self.max_rows,))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+            }
+
+    def close(self):
+        # Writes pending last_used times and closes the calling thread's
+        # connection
+        self.flush()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None